@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""Offline benchmark of the DM workflow against mock_instagram_server across inbox sizes.
+
+Each scenario gets its own mock server and scratch directory, then runs the workflow three times
+the way the daemon would see it: a cold run (fresh login), an unchanged run (saved session,
+nothing new) and a changed run (a few threads got new messages). Per-stage timings come from the
+run's exported spans (instagram_run_metrics.json), end-to-end time from the wall clock.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from mock_instagram_server import Scenario, start_mock_server
+from telemetry import RUN_METRICS_FILE
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# name: (threads, messages per thread)
+SCENARIOS = {
+    "small": (5, 20),
+    "medium": (25, 50),
+    "large": (100, 100),
+}
+
+STAGES = ["inbox_check", "login", "navigate", "inbox", "conversations"]
+
+# Threads that get a new message before the "changed" pass
+CHANGED_THREADS = 3
+
+BENCHMARK_RESULTS_FILE = "benchmark_results.json"
+
+
+def run_workflow(base_url, workdir, env_overrides, timeout):
+    """Run main.py once in workdir against base_url; returns (seconds, exit code, run metrics or None)"""
+    env = dict(os.environ)
+    env.update({
+        "INSTAGRAM_BASE_URL": base_url,
+        "INSTAGRAM_USERNAME": "bench_user",
+        "INSTAGRAM_PASSWORD": "bench_password",
+        "INSTAGRAM_HEADLESS": "1",
+        "INSTAGRAM_KEEP_BROWSER_OPEN": "0",
+        "INSTAGRAM_SUMMARIZE": "0",
+        "PYTHONPATH": REPO_DIR + os.pathsep + env.get("PYTHONPATH", ""),
+    })
+    env.update(env_overrides)
+
+    metrics_path = os.path.join(workdir, RUN_METRICS_FILE)
+    if os.path.exists(metrics_path):
+        os.remove(metrics_path)
+
+    start = time.monotonic()
+    with open(os.path.join(workdir, "workflow.log"), "a", encoding="utf-8") as log:
+        try:
+            code = subprocess.run([sys.executable, os.path.join(REPO_DIR, "main.py")], cwd=workdir, env=env,
+                                  stdout=log, stderr=subprocess.STDOUT, timeout=timeout).returncode
+        except subprocess.TimeoutExpired:
+            code = "timeout"
+    elapsed = time.monotonic() - start
+
+    metrics = None
+    if os.path.exists(metrics_path):
+        with open(metrics_path, "r", encoding="utf-8") as f:
+            metrics = json.load(f)
+    return elapsed, code, metrics
+
+
+def took_fast_path(metrics):
+    """Whether the run stopped at the inbox check because the inbox matched its stored fingerprint"""
+    for metric in (metrics or {}).get("metrics", []):
+        if metric["name"] == "inbox_unchanged":
+            return bool(metric["value"])
+    return False
+
+
+def stage_timings(metrics):
+    """Total seconds per stage span, plus conversation counts, from one run's exported spans"""
+    timings = {}
+    ok = failed = 0
+    for span in (metrics or {}).get("spans", []):
+        if span["name"] == "conversation":
+            ok += span["status"] == "ok"
+            failed += span["status"] == "error"
+        elif span["name"] in STAGES:
+            timings[span["name"]] = timings.get(span["name"], 0.0) + (span["duration_s"] or 0.0)
+    return timings, ok, failed
+
+
+def benchmark_scenario(name, threads, messages, args):
+    scenario = Scenario(threads, messages, args.latency_ms, args.jitter_ms, api=not args.no_api)
+    server, base_url = start_mock_server(scenario)
+    results = []
+    try:
+        with tempfile.TemporaryDirectory(prefix=f"igbench-{name}-") as workdir:
+            env_overrides = {
+                "INSTAGRAM_SESSION_DIR": os.path.join(workdir, "sessions"),
+                "INSTAGRAM_CONCURRENCY": str(args.concurrency),
+                # The cold run opens every thread; a cut-short run stores no fingerprint for the next pass
+                "INSTAGRAM_RUN_DEADLINE": str(args.deadline),
+                "INSTAGRAM_BLOCK_PROFILE": args.block_profile,
+            }
+            for kind in ("cold", "unchanged", "changed"):
+                if kind == "changed":
+                    request = urllib.request.Request(
+                        f"{base_url}/__mock/new_messages?threads={CHANGED_THREADS}&per_thread=2", method="POST"
+                    )
+                    urllib.request.urlopen(request).read()
+                requests_before = scenario.requests
+                elapsed, code, metrics = run_workflow(base_url, workdir, env_overrides, args.timeout)
+                timings, ok, failed = stage_timings(metrics)
+                unchanged = took_fast_path(metrics)
+                if kind == "unchanged" and not unchanged:
+                    print(f"  ⚠️ {name}/unchanged did a full collection instead of the fingerprint fast path")
+                results.append({
+                    "scenario": name,
+                    "threads": threads,
+                    "messages": messages,
+                    "run": kind,
+                    "exit_code": code,
+                    "end_to_end_s": round(elapsed, 2),
+                    "run_s": metrics["duration_s"] if metrics else None,
+                    "unchanged": unchanged,
+                    "stages_s": {stage: round(seconds, 2) for stage, seconds in timings.items()},
+                    "conversations_ok": ok,
+                    "conversations_failed": failed,
+                    "server_requests": scenario.requests - requests_before,
+                })
+                print(f"  {name}/{kind}: {elapsed:.1f}s (exit {code})")
+            if args.keep_logs:
+                with open(os.path.join(workdir, "workflow.log"), "r", encoding="utf-8") as f:
+                    with open(f"benchmark_{name}.log", "w", encoding="utf-8") as out:
+                        out.write(f.read())
+    finally:
+        server.shutdown()
+    return results
+
+
+def print_table(results):
+    header = ["scenario", "run", "fast path", "total"] + STAGES + ["convos", "reqs"]
+    rows = []
+    for result in results:
+        stages = [f"{result['stages_s'][stage]:.2f}" if stage in result["stages_s"] else "-" for stage in STAGES]
+        convos = f"{result['conversations_ok']}" + (f"/{result['conversations_failed']}!" if result["conversations_failed"] else "")
+        rows.append([f"{result['scenario']} ({result['threads']}x{result['messages']})", result["run"],
+                     "yes" if result["unchanged"] else "no", f"{result['end_to_end_s']:.2f}"] + stages + [convos, str(result["server_requests"])])
+    widths = [max(len(str(row[i])) for row in [header] + rows) for i in range(len(header))]
+    print("\n" + "  ".join(text.ljust(width) for text, width in zip(header, widths)))
+    print("  ".join("-" * width for width in widths))
+    for row in rows:
+        print("  ".join(str(text).ljust(width) for text, width in zip(row, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the DM workflow offline against a mock Instagram")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Comma-separated scenarios from {', '.join(SCENARIOS)}, or THREADSxMESSAGES")
+    parser.add_argument("--latency-ms", type=int, default=50, help="Delay the mock adds to every response")
+    parser.add_argument("--jitter-ms", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=1, help="INSTAGRAM_CONCURRENCY for the workflow")
+    parser.add_argument("--no-api", action="store_true", help="Serve pages only, forcing DOM extraction")
+    parser.add_argument("--block-profile", default="dm-only",
+                        help="INSTAGRAM_BLOCK_PROFILE for the workflow; compare with 'none' to see what blocking costs")
+    parser.add_argument("--deadline", type=int, default=1800, help="INSTAGRAM_RUN_DEADLINE for the workflow")
+    parser.add_argument("--timeout", type=int, default=2400, help="Seconds before a single run is killed")
+    parser.add_argument("--output", default=BENCHMARK_RESULTS_FILE, help="Where to write the results as JSON")
+    parser.add_argument("--keep-logs", action="store_true", help="Copy each scenario's workflow output next to the results")
+    args = parser.parse_args()
+
+    results = []
+    for name in [name.strip() for name in args.scenarios.split(",") if name.strip()]:
+        if name in SCENARIOS:
+            threads, messages = SCENARIOS[name]
+        else:
+            threads, messages = (int(part) for part in name.split("x"))
+        print(f"\n⏱️ Benchmarking {name}: {threads} threads x {messages} messages, {args.latency_ms}ms latency")
+        results.extend(benchmark_scenario(name, threads, messages, args))
+
+    print_table(results)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({
+            "created_at": time.strftime('%Y-%m-%d %H:%M:%S'),
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "concurrency": args.concurrency,
+            "api": not args.no_api,
+            "block_profile": args.block_profile,
+            "results": results,
+        }, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
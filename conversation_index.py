@@ -0,0 +1,57 @@
+from datetime import datetime
+
+from json_store import JsonFileStore
+
+# File mapping each account's usernames to the thread they were last found in
+CONVERSATION_INDEX_FILE = "conversation_index.json"
+
+
+class ConversationIndex(JsonFileStore):
+    """Persistent username -> conversation id/thread URL lookup for one account"""
+
+    description = "conversation index"
+
+    def __init__(self, account, path=CONVERSATION_INDEX_FILE):
+        super().__init__(path)
+        self.account = account or "default"
+        self.entries = {}
+
+    def loaded(self):
+        self.entries = self.data.setdefault(self.account, {})
+
+    def get(self, username):
+        """Return the saved entry for a username, or None if we've never opened their thread"""
+        entry = self.entries.get(username)
+        if entry and entry.get("conversation_id"):
+            return entry
+        return None
+
+    def record(self, username, conversation_id, url):
+        """Remember which thread a username lives in"""
+        if not conversation_id or conversation_id == "unknown":
+            return
+        entry = self.entries.setdefault(username, {})
+        entry.update({
+            "conversation_id": conversation_id,
+            "url": url,
+            "last_seen": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        })
+        self.changed = True
+
+    def last_preview(self, username):
+        """The inbox preview text we saw for this username last run"""
+        return self.entries.get(username, {}).get("last_preview")
+
+    def record_preview(self, username, preview):
+        """Remember the inbox preview so the next run can tell if the thread changed"""
+        entry = self.entries.setdefault(username, {})
+        if entry.get("last_preview") != preview:
+            entry["last_preview"] = preview
+            self.changed = True
+
+    def forget(self, username):
+        """Drop a stale entry so the inbox search runs for this username again"""
+        entry = self.entries.get(username)
+        if entry and entry.pop("conversation_id", None) is not None:
+            entry.pop("url", None)
+            self.changed = True
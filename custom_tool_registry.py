@@ -1,19 +1,14 @@
 import logging
 from abc import ABC, abstractmethod
-import asyncio
-from playwright.async_api import async_playwright
 import os
 from pydantic import BaseModel, Field
 from portia import Tool, InMemoryToolRegistry
 from typing import Dict, Any, Optional, Type, Tuple, Literal
+from shared_session import shared_session
+from result_cache import messages_cache
 
 logger = logging.getLogger(__name__)
 
-# Global variables to maintain state
-browser_instance = None
-page_instance = None
-playwright_instance = None
-
 class BaseTool(ABC):
     """Base class for implementing custom tools"""
     id = None
@@ -51,6 +46,8 @@ class InstagramMessagesOutputSchema(BaseModel):
     """Schema for Instagram Messages outputs"""
     unread_count: int = Field(..., description="Number of unread messages")
     message_previews: list = Field(default_factory=list, description="Preview of messages")
+    new_messages: list = Field(default_factory=list, description="Messages collected since the last check")
+    unchanged: bool = Field(False, description="Whether the inbox was unchanged since the last check")
     is_dm_page: bool = Field(..., description="Whether navigation to DMs was successful")
 
 class InstagramAuthenticationTool(Tool):
@@ -63,19 +60,21 @@ class InstagramAuthenticationTool(Tool):
     should_summarize: bool = True
     
     def run(self, ctx, username: str, password: str) -> Dict[str, Any]:
-        """Run the Instagram authentication process"""
-        # Your implementation here
-        # For example:
-        import asyncio
-        from main import run_instagram_workflow
-        
-        # Call your existing Instagram login function
-        result = asyncio.run(run_instagram_workflow())
+        """Log in on the shared browser session, which later tool calls reuse"""
+        try:
+            shared_session.login(username, password)
+        except Exception as e:
+            logger.exception("Instagram login failed")
+            return {
+                "success": False,
+                "message": f"Instagram login failed: {e}",
+                "screenshot": "error_state.png"
+            }
         
         return {
             "success": True,
             "message": "Successfully logged into Instagram",
-            "screenshot": "3_home_page.png"
+            "screenshot": "2_home_page.png"
         }
 
 class InstagramMessagesSummaryTool(Tool):
@@ -87,17 +86,44 @@ class InstagramMessagesSummaryTool(Tool):
     should_summarize: bool = True
     
     def run(self, ctx) -> Dict[str, Any]:
-        """Retrieve and summarize Instagram direct messages"""
-        # Your implementation here
-        # For now, return a placeholder response
-        return {
-            "unread_count": 2,
+        """Retrieve and summarize Instagram direct messages from the shared browser session"""
+        # Plans often ask for messages several times in a row, answer repeats from the cache
+        cache_key = (shared_session.account(), ())
+        cached = messages_cache.get(cache_key)
+        if cached is not None:
+            logger.info("instagram_messages cache hit (%s)", messages_cache.stats())
+            return cached
+        
+        poll_result, inbox_threads, is_dm_page = shared_session.messages()
+        
+        new_messages = [
+            {
+                "conversation": convo["username"],
+                "sender": "You" if msg.get("is_mine") else convo["username"],
+                "text": msg.get("text", ""),
+                "timestamp": msg.get("timestamp")
+            }
+            for convo in poll_result["conversations"]
+            for msg in convo["messages"]
+        ]
+        result = {
+            "unread_count": poll_result["unread_count"],
             "message_previews": [
-                {"sender": "user1", "preview": "Hey there!", "unread": True},
-                {"sender": "user2", "preview": "Check this out", "unread": True}
+                {
+                    "sender": thread["display_name"],
+                    "preview": thread["preview"],
+                    "unread": thread["unread"],
+                    "timestamp": thread["timestamp"]
+                }
+                for thread in inbox_threads
             ],
-            "is_dm_page": True
+            "new_messages": new_messages,
+            "unchanged": poll_result["unchanged"],
+            "is_dm_page": is_dm_page
         }
+        messages_cache.put(cache_key, result)
+        logger.info("instagram_messages cache miss (%s)", messages_cache.stats())
+        return result
 
 # Create the registry
 custom_tool_registry = InMemoryToolRegistry.from_local_tools(
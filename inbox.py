@@ -0,0 +1,117 @@
+import os
+
+from instagram_urls import thread_url
+
+# Stop enumerating once we've seen this many threads
+MAX_INBOX_THREADS = int(os.environ.get("INSTAGRAM_MAX_INBOX_THREADS", "200"))
+
+# Upper bound on scroll steps through the virtualised thread list
+MAX_INBOX_SCROLLS = 30
+
+# Reads the thread rows currently rendered in the inbox list
+READ_INBOX_ROWS_JS = '''
+() => {
+    const list = document.querySelector('[aria-label="Chats"]') ||
+                 document.querySelector('div[role="listbox"]') ||
+                 document.querySelector('div[aria-label="Thread list"]');
+    if (!list) return [];
+
+    // Only keep the outermost match of each row
+    const candidates = Array.from(list.querySelectorAll('[role="listitem"], a[href*="/direct/t/"], div[role="button"]'));
+    const candidateSet = new Set(candidates);
+    const rows = candidates.filter(row => {
+        for (let parent = row.parentElement; parent && parent !== list; parent = parent.parentElement) {
+            if (candidateSet.has(parent)) return false;
+        }
+        return true;
+    });
+
+    const threads = [];
+    const seen = new Set();
+    for (const row of rows) {
+        const lines = row.innerText.split('\\n').map(line => line.trim()).filter(Boolean);
+        if (lines.length === 0) continue;
+
+        const link = row.matches('a[href*="/direct/t/"]') ? row : row.querySelector('a[href*="/direct/t/"]');
+        const href = link ? link.getAttribute('href') : '';
+        const idMatch = href.match(/\\/direct\\/t\\/([^/?#]+)/);
+        const key = idMatch ? idMatch[1] : lines[0];
+        if (seen.has(key)) continue;
+        seen.add(key);
+
+        // Preview rows look like "hi · 2m" with an optional "Unread" marker
+        const detail = lines.slice(1).filter(line => line !== 'Unread').join(' ');
+        const parts = detail.split(' · ');
+        threads.push({
+            conversation_id: idMatch ? idMatch[1] : null,
+            display_name: lines[0],
+            preview: parts[0] || '',
+            timestamp: parts.length > 1 ? parts[parts.length - 1] : null,
+            unread: lines.includes('Unread') || row.querySelector('[aria-label*="nread"]') !== null
+        });
+    }
+    return threads;
+}
+'''
+
+# Scrolls the thread list down by one screen; returns false once it can't go further
+SCROLL_INBOX_JS = '''
+() => {
+    const list = document.querySelector('[aria-label="Chats"]') ||
+                 document.querySelector('div[role="listbox"]') ||
+                 document.querySelector('div[aria-label="Thread list"]');
+    if (!list) return false;
+    // The scrolling element is the list itself or its nearest scrollable ancestor
+    let scroller = list;
+    while (scroller && scroller.scrollHeight <= scroller.clientHeight) scroller = scroller.parentElement;
+    if (!scroller) return false;
+    const before = scroller.scrollTop;
+    scroller.scrollTop = before + scroller.clientHeight;
+    return scroller.scrollTop > before;
+}
+'''
+
+
+async def enumerate_inbox(page, run, list_selector, max_threads=MAX_INBOX_THREADS, max_scrolls=MAX_INBOX_SCROLLS,
+                          use_network=True):
+    """Read the thread list once, returning id, name, preview, timestamp and unread flag per thread.
+
+    Uses the inbox payload the web client fetched when there is one, otherwise reads the rendered
+    rows, scrolling the virtualised list until no new rows show up or max_scrolls is reached.
+    """
+    if use_network and run.response_capture:
+        threads = run.response_capture.inbox_threads()
+        if threads:
+            print(f"📥 Read {len(threads)} inbox threads from network responses")
+            return threads[:max_threads]
+
+    threads = {}
+    for step in range(max_scrolls + 1):
+        new_rows = 0
+        for row in await page.evaluate(READ_INBOX_ROWS_JS):
+            key = row['conversation_id'] or row['display_name']
+            if key not in threads:
+                threads[key] = row
+                new_rows += 1
+        if new_rows == 0 or len(threads) >= max_threads or step == max_scrolls:
+            break
+        if not await page.evaluate(SCROLL_INBOX_JS):
+            break
+        # Let the virtualised list render the next batch of rows
+        await run.readiness.dom_quiet(page, list_selector)
+
+    print(f"📥 Read {len(threads)} inbox threads from the thread list")
+    return list(threads.values())[:max_threads]
+
+
+def select_changed_threads(threads, conversation_index):
+    """Threads that are unread or whose preview changed since the last successful collection"""
+    changed = []
+    for thread in threads:
+        name = thread['display_name']
+        if thread['unread'] or conversation_index.last_preview(name) != thread['preview']:
+            changed.append(thread)
+        # Remember the thread id so it can be opened directly
+        if thread['conversation_id']:
+            conversation_index.record(name, thread['conversation_id'], thread_url(thread['conversation_id']))
+    return changed
@@ -0,0 +1,59 @@
+import hashlib
+import json
+from datetime import datetime
+
+from json_store import JsonFileStore
+
+# Last inbox fingerprint per account, so a poll can tell nothing moved without opening any thread
+INBOX_FINGERPRINTS_FILE = "inbox_fingerprints.json"
+
+# Threads with new activity move to the top, so the first screen of the inbox is enough
+FINGERPRINT_THREADS = 20
+
+
+def inbox_fingerprint(threads, limit=FINGERPRINT_THREADS, opened=()):
+    """Hash of the top threads' ids, last-message previews and unread badges, or None if there are none.
+
+    Threads named in opened count as read, since opening a thread clears its badge.
+    """
+    if not threads:
+        return None
+    key = [
+        [
+            thread['conversation_id'] or thread['display_name'],
+            thread['preview'],
+            bool(thread['unread']) and thread['display_name'] not in opened,
+        ]
+        for thread in threads[:limit]
+    ]
+    return hashlib.sha1(json.dumps(key).encode("utf-8")).hexdigest()
+
+
+class InboxFingerprints(JsonFileStore):
+    """The fingerprint of the inbox as of the last fully collected run, plus its unread count"""
+
+    description = "inbox fingerprints"
+
+    def __init__(self, account, path=INBOX_FINGERPRINTS_FILE):
+        super().__init__(path)
+        self.account = account or "default"
+
+    def get(self):
+        """The stored entry for this account, or None before the first complete run"""
+        return self.data.get(self.account)
+
+    def matches(self, fingerprint):
+        """Whether the inbox looks exactly like it did after the last complete run"""
+        entry = self.get()
+        return bool(fingerprint) and entry is not None and entry.get("fingerprint") == fingerprint
+
+    def update(self, fingerprint, unread_count):
+        """Remember the inbox state a run has fully collected"""
+        if not fingerprint:
+            return
+        self.data[self.account] = {
+            "fingerprint": fingerprint,
+            "unread_count": unread_count,
+            "updated": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        self.changed = True
@@ -0,0 +1,12 @@
+import os
+
+# Where the workflow points its browser; override to run against a local mock (see mock_instagram_server.py)
+BASE_URL = os.environ.get("INSTAGRAM_BASE_URL", "https://www.instagram.com").rstrip("/")
+
+HOME_URL = f"{BASE_URL}/"
+INBOX_URL = f"{BASE_URL}/direct/inbox/"
+
+
+def thread_url(conversation_id):
+    """Direct URL of a conversation thread"""
+    return f"{BASE_URL}/direct/t/{conversation_id}/"
@@ -0,0 +1,49 @@
+import json
+import os
+
+
+class JsonFileStore:
+    """A dict persisted as one JSON file between runs, rewritten atomically when it changed.
+
+    Subclasses keep their state in self.data, set changed when they modify it, and can
+    override loaded() to pick their part of the data once it's been read.
+    """
+
+    # What the file holds, for log messages
+    description = "data"
+
+    def __init__(self, path):
+        self.path = path
+        self.data = {}
+        self.changed = False
+
+    @classmethod
+    def load(cls, *args, **kwargs):
+        """Build the store and read its file, starting empty if it's missing or unreadable"""
+        store = cls(*args, **kwargs)
+        if os.path.exists(store.path):
+            try:
+                with open(store.path, "r") as f:
+                    store.data = json.load(f)
+            except Exception as e:
+                print(f"Could not read {store.description} {store.path}: {e}")
+                store.data = {}
+        store.loaded()
+        return store
+
+    def loaded(self):
+        """Called once self.data holds the file's contents"""
+
+    def save(self):
+        """Write the file back to disk if anything changed"""
+        if not self.changed:
+            return
+        try:
+            # Through a temp file, a crash mid-write must not truncate it and make load() start empty
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w") as f:
+                json.dump(self.data, f, indent=2)
+            os.replace(temp_path, self.path)
+            self.changed = False
+        except Exception as e:
+            print(f"Error saving {self.description}: {e}")
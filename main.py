@@ -1,8 +1,29 @@
 from dotenv import load_dotenv
 import asyncio
 import os
+import re
 import time
 from playwright.async_api import async_playwright, TimeoutError
+from instagram_urls import HOME_URL, INBOX_URL, thread_url
+from session_store import load_session, save_session, clear_session, is_session_valid
+from conversation_index import ConversationIndex
+from network_capture import DirectResponseCapture, DIRECT_API_PATH
+from request_blocking import RequestBlocker
+from readiness import ReadinessWaiter
+from selector_strategy import SelectorStrategy
+from popup_interceptor import PopupInterceptor
+from inbox import enumerate_inbox, select_changed_threads
+from inbox_fingerprint import InboxFingerprints, inbox_fingerprint, FINGERPRINT_THREADS
+from message_checkpoints import MessageCheckpoints
+from message_store import MessageStore, MESSAGE_STORE_FILE
+from summarizer import ThreadSummarizer
+from message_parser import parse_message_rows
+from run_budget import (
+    RunBudget, CircuitBreaker, DeadlineExceeded, PermanentFailure, backoff_delay, CONVERSATION_TIMEOUT,
+    CONVERSATION_RETRIES, STAGE_RETRIES
+)
+from telemetry import Tracer
+from report_records import ReportWriter, render_text_report, unfinished_run, REPORT_RECORDS_FILE, TEXT_REPORT_FILE
 
 load_dotenv()
 
@@ -10,89 +31,601 @@ load_dotenv()
 INSTAGRAM_USERNAME = os.environ.get("INSTAGRAM_USERNAME")
 INSTAGRAM_PASSWORD = os.environ.get("INSTAGRAM_PASSWORD")
 
+# How many conversation pages to work on at once (1 keeps the old one-at-a-time behaviour)
+MAX_CONCURRENT_CONVERSATIONS = int(os.environ.get("INSTAGRAM_CONCURRENCY", "1"))
+
+# Comma-separated usernames to always check; when empty, threads are discovered from the inbox
+TARGET_USERNAMES = [name.strip() for name in os.environ.get("INSTAGRAM_TARGET_USERNAMES", "").split(",") if name.strip()]
+
+# Most recent messages to keep per thread, and the most elements the DOM fallback may visit
+MAX_MESSAGES_PER_THREAD = int(os.environ.get("INSTAGRAM_MAX_MESSAGES", "10"))
+MAX_EXTRACT_NODES = int(os.environ.get("INSTAGRAM_MAX_EXTRACT_NODES", "5000"))
+
+# Raw DOM rows to read per message kept, since separators and UI rows are mixed in with messages
+RAW_ROWS_PER_MESSAGE = 3
+
+# Summarize collected threads with an LLM (on by default when an OpenAI key is configured)
+SUMMARIZE = os.environ.get("INSTAGRAM_SUMMARIZE", "1" if os.environ.get("OPENAI_API_KEY") else "0") == "1"
+
+# Extra seconds the report waits on the summarizer past its own deadline before giving up on it
+SUMMARY_DEADLINE_GRACE = 5
+
+# Run Chromium without a window (the daemon turns this on)
+HEADLESS = os.environ.get("INSTAGRAM_HEADLESS", "0") == "1"
+
+# Wait for Enter before closing the browser so it can be inspected after a one-off run
+KEEP_BROWSER_OPEN = os.environ.get("INSTAGRAM_KEEP_BROWSER_OPEN", "1") == "1"
+
+# Which assets to stop the browser from downloading (see request_blocking.BLOCK_PROFILES)
+REQUEST_BLOCK_PROFILE = os.environ.get("INSTAGRAM_BLOCK_PROFILE", "dm-only")
+
+# How long (s) the inbox check waits for the inbox payload once the thread list has rendered
+INBOX_PAYLOAD_GRACE = 0.5
+
+# What "ready" looks like for the inbox thread list and an open thread's message list
+THREAD_LIST_SELECTOR = 'div[role="listbox"], [aria-label="Chats"], div[aria-label="Messages"]'
+MESSAGE_LIST_SELECTOR = 'div[aria-label^="Messages in conversation"], div[role="grid"]'
+
 print("\n🔒 Starting Instagram DM Summary Tool")
 
-async def run_instagram_workflow():
-    """Run the complete Instagram workflow with proper error handling"""
+# In-page fallback that clicks up through the parents of a username span
+PARENT_CLICK_JS = '''
+(username) => {
+    const element = document.querySelector(`span:has-text("${username}")`);
+    if (element) {
+        // Navigate up to find clickable container
+        let parent = element.parentElement;
+        for (let i = 0; i < 5 && parent; i++) {
+            try {
+                parent.click();  // Try clicking each parent
+                return true;
+            } catch (e) {
+                parent = parent.parentElement;
+            }
+        }
+    }
+    return false;
+}
+'''
+
+# In-page message extraction for an open thread. It only looks inside the message list,
+# walks it once from the newest row back, and stops at maxMessages rows, at the last message
+# we already reported (stopAt), or after maxNodes elements when there's no row markup.
+EXTRACT_MESSAGES_JS = '''
+({maxMessages, maxNodes, stopAt}) => {
+    const container = document.querySelector('div[aria-label^="Messages in conversation"]') ||
+                      document.querySelector('div[role="grid"]') ||
+                      document.querySelector('main') ||
+                      document.body;
+
+    // Collect candidate nodes first without touching layout
+    let rows = Array.from(container.querySelectorAll('div[role="row"]'));
+    if (rows.length === 0) {
+        // No row markup: one bounded walk over leaf text blocks
+        const walker = document.createTreeWalker(container, NodeFilter.SHOW_ELEMENT);
+        let visited = 0;
+        while (visited < maxNodes && walker.nextNode()) {
+            visited++;
+            const el = walker.currentNode;
+            if (el.getAttribute('dir') === 'auto' && el.childElementCount === 0 && el.textContent.trim()) {
+                rows.push(el);
+            }
+        }
+    }
+    const total = rows.length;
+
+    // Layout-dependent reads all happen here in one batch, with no DOM writes in between.
+    // Newest messages are at the bottom of the list, so walk backwards.
+    const bounds = container.getBoundingClientRect();
+    const midpoint = bounds.left + bounds.width / 2;
+    const messages = [];
+    let reachedSeen = false;
+    for (let i = rows.length - 1; i >= 0 && messages.length < maxMessages; i--) {
+        const row = rows[i];
+        const text = row.innerText.trim();
+        if (!text) continue;
+        const bubble = row.querySelector('div[dir="auto"]') || row;
+        const rect = bubble.getBoundingClientRect();
+        const isMine = rect.width > 0 && rect.left + rect.width / 2 > midpoint;
+        // Raw rows wrap the message text in sender labels and hints, so match it as a line too
+        const lines = text.split('\n').map(line => line.trim());
+        if (stopAt && (text === stopAt.text || lines.includes(stopAt.text)) && isMine === stopAt.is_mine) {
+            reachedSeen = true;
+            break;
+        }
+        const time = row.querySelector('time');
+        // The message bubble's own text tells a message that looks like a time from a day separator
+        const bubbleText = row.matches('div[role="row"]') && row.querySelector('div[dir="auto"]') ?
+            row.querySelector('div[dir="auto"]').innerText.trim() : null;
+        messages.push({
+            text: text,
+            is_mine: isMine,
+            timestamp: time ? time.getAttribute('datetime') : null,
+            bubble: bubbleText
+        });
+    }
+    messages.reverse();
+
+    return {
+        url: window.location.href,
+        conversation_id: window.location.href.match(/\\/t\\/(.*?)(\\/|$)/)?.[1] || '',
+        message_count: total,
+        messages: messages,
+        reached_seen: reachedSeen
+    };
+}
+'''
+
+
+class RunContext:
+    """Per-run helpers shared by every stage and every page"""
     
-    print("Starting browser...")
-    playwright = await async_playwright().start()
-    browser = await playwright.chromium.launch(headless=False)
-    context = await browser.new_context(
-        viewport={"width": 1280, "height": 800},
-        user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36"
-    )
-    page = await context.new_page()
+    def __init__(self, conversation_index=None, response_capture=None, readiness=None, selectors=None, checkpoints=None,
+                 inbox_fingerprints=None, account=None, budget=None, tracer=None, request_blocker=None):
+        self.account = account
+        self.budget = budget
+        self.tracer = tracer or Tracer(account)
+        # Response bytes seen so far (from Content-Length), across every page
+        self.bytes_received = 0
+        self.conversation_index = conversation_index
+        self.response_capture = response_capture
+        self.readiness = readiness or ReadinessWaiter()
+        self.selectors = selectors or SelectorStrategy()
+        self.checkpoints = checkpoints
+        self.inbox_fingerprints = inbox_fingerprints
+        self.request_blocker = request_blocker
+
+
+async def login_to_instagram(page, run, username, password):
+    """Log in with the form, handling verification prompts (the popup interceptor takes care of cookie consent)"""
+    print("\n📱 Logging into Instagram...")
+    await page.goto(HOME_URL)
+    
+    # Wait for and fill login form
+    await page.wait_for_selector('input[name="username"]')
+    await page.fill('input[name="username"]', username)
+    await page.fill('input[name="password"]', password)
+    
+    # Take screenshot of login page
+    await page.screenshot(path="1_login_page.png")
+    print("✅ Screenshot saved: 1_login_page.png")
+    
+    # Click login button
+    await page.click('button[type="submit"]')
+    print("Clicked login button, waiting for home page...")
     
+    # Handle verification if needed
     try:
-        # Step 1: Login to Instagram
-        print("\n📱 Logging into Instagram...")
-        await page.goto("https://www.instagram.com/")
+        verification_selector = 'input[name="verificationCode"], input[placeholder*="code"]'
+        verify_element = await page.wait_for_selector(verification_selector, timeout=8000)
+    
+        if verify_element:
+            await page.screenshot(path="2_verification_page.png")
+            print("\n⚠️ Verification required!")
+            print("✅ Screenshot saved: 2_verification_page.png")
+            print("Please check your email for a code, enter it in the browser")
+            print("Waiting for you to complete verification (60 seconds)...")
+    
+            # Wait for user to enter verification code and click continue
+            await page.wait_for_selector('svg[aria-label="Home"], a[href="/direct/inbox/"]', timeout=60000)
+    except Exception:
+        # No verification needed, continue
+        print("No verification needed, continuing...")
+
+
+async def open_known_conversation(page, username, entry, run):
+    """Open a thread straight from its saved URL, returning False if the entry looks stale"""
+    url = thread_url(entry['conversation_id'])
+    print(f"Opening known conversation with {username} directly: {url}")
+    try:
+        await page.goto(url, timeout=15000)
+        await page.wait_for_load_state("domcontentloaded", timeout=10000)
+        if f"/direct/t/{entry['conversation_id']}" not in page.url:
+            return False
+        # Threads without row markup (or with no messages yet) still render the message list
+        return await run.readiness.selector(page, MESSAGE_LIST_SELECTOR)
+    except Exception as e:
+        print(f"Could not open saved conversation for {username}: {e}")
+        return False
+
+
+async def open_conversation_via_search(page, username, run):
+    """Find a username in the inbox and click into their thread.
+    
+    Raises if the username can't be found, returns False if clicking didn't open the thread.
+    """
+    # First make sure we're at the inbox page
+    if not "/direct/inbox/" in page.url:
+        print("Navigating back to inbox...")
+        await page.goto(INBOX_URL, timeout=15000)
+        await page.wait_for_load_state("domcontentloaded", timeout=10000)
+    
+    # Wait for the thread list itself rather than a fixed pause
+    await run.readiness.selector(page, THREAD_LIST_SELECTOR)
+    
+    # Use the selector that worked for "divit" for each username
+    username_selector = f'span:has-text("{username}")'
+    
+    # Try to find the conversation with longer timeout
+    conversation = await page.wait_for_selector(username_selector, timeout=8000)
+    if not conversation:
+        return False
+    print(f"✅ Found '{username}' conversation!")
+    
+    # Take screenshot showing what we found
+    await page.screenshot(path=f"found_{username}.png")
+    
+    # Try direct click first
+    try:
+        await conversation.click()
+        print(f"✅ Direct click on {username} conversation")
+        await run.readiness.url_contains(page, '/direct/t/')
+    except Exception as e:
+        print(f"Direct click failed: {e}")
         
-        # Handle cookie consent dialog if it appears
-        try:
-            print("Checking for cookie consent dialog...")
-            cookie_selector = 'button:has-text("Decline optional cookies"), button:has-text("Reject"), button:has-text("Decline")'
-            cookie_button = await page.wait_for_selector(cookie_selector, timeout=5000)
-            if cookie_button:
-                await cookie_button.click()
-                print("✅ Clicked 'Reject' on cookie dialog")
-                await page.wait_for_timeout(1000) # Wait for dialog to close
-        except Exception as e:
-            print(f"No cookie dialog or couldn't handle it: {e}")
+        # If direct click fails, try parent element click with JavaScript
+        print("Trying parent element click...")
+        await page.evaluate(PARENT_CLICK_JS, username)
+        print(f"✅ Attempted parent clicks for {username}")
+        await run.readiness.url_contains(page, '/direct/t/')
+    
+    # Check if navigation occurred
+    return '/direct/t/' in page.url
+
+
+def conversation_id_from_url(url):
+    """Pull the thread id out of a /direct/t/<id>/ URL"""
+    match = re.search(r"/direct/t/([^/?#]+)", url)
+    return match.group(1) if match else ''
+
+
+async def extract_conversation(page, username, run):
+    """Screenshot the open thread and pull the messages newer than its checkpoint (or the most recent ones on first sight)"""
+    # Let the message list finish rendering before we read it
+    await run.readiness.dom_quiet(page, MESSAGE_LIST_SELECTOR)
+    
+    # Take screenshot of the conversation
+    screenshot_path = f"conversation_{username}.png"
+    await page.screenshot(path=screenshot_path)
+    print(f"✅ Saved conversation screenshot: {screenshot_path}")
+    
+    # Prefer the thread payload the web client already fetched, it has exact senders and timestamps
+    conversation_id = conversation_id_from_url(page.url)
+    checkpoint = run.checkpoints.get(conversation_id) if run.checkpoints else None
+    thread = run.response_capture.get_thread(conversation_id) if run.response_capture else None
+    if thread:
+        # Walk back from the newest message until we hit one we've already reported
+        new_messages = []
+        for msg in reversed(thread['messages']):
+            if len(new_messages) >= MAX_MESSAGES_PER_THREAD or (checkpoint and run.checkpoints.is_seen(conversation_id, msg)):
+                break
+            new_messages.append({
+                'id': msg['id'],
+                'text': msg['text'],
+                'is_mine': msg['is_mine'],
+                'timestamp': msg['timestamp'],
+                'timestamp_us': msg['timestamp_us']
+            })
+        new_messages.reverse()
+        print(f"📝 Read {len(new_messages)} new messages with {username} from network responses")
+        return {
+            'username': username,
+            'url': page.url,
+            'conversation_id': conversation_id,
+            'message_count': len(thread['messages']),
+            'messages': new_messages,
+            'incremental': checkpoint is not None,
+            'unread': thread['unread'],
+            'source': 'network',
+            'screenshot': screenshot_path
+        }
+    
+    # Fall back to scraping the DOM
+    print(f"📝 Extracting messages from conversation with {username}...")
+    stop_at = {'text': checkpoint['text'], 'is_mine': checkpoint['is_mine']} if checkpoint else None
+    message_data = await page.evaluate(
+        EXTRACT_MESSAGES_JS,
+        {'maxMessages': MAX_MESSAGES_PER_THREAD * RAW_ROWS_PER_MESSAGE, 'maxNodes': MAX_EXTRACT_NODES, 'stopAt': stop_at}
+    )
+    
+    # Separate real messages from day separators, sender labels and UI hints
+    messages, parse_stats = parse_message_rows(message_data.get('messages', []), username, run.account)
+    print(f"Parsed {parse_stats['rows']} rows into {parse_stats['messages']} messages "
+          f"({parse_stats['separators']} separators, {parse_stats['noise']} UI rows dropped)")
+    conversation_id = message_data.get('conversation_id') or 'unknown'
+    if checkpoint:
+        # The in-page stop is a fast heuristic, the parsed checkpoint comparison is authoritative
+        for i in range(len(messages) - 1, -1, -1):
+            if run.checkpoints.is_seen(conversation_id, messages[i]):
+                messages = messages[i + 1:]
+                break
+    
+    # Store important data from this conversation
+    return {
+        'username': username,
+        'url': message_data.get('url', ''),
+        'conversation_id': conversation_id,
+        'message_count': parse_stats['messages'],
+        'messages': messages[-MAX_MESSAGES_PER_THREAD:],
+        'incremental': checkpoint is not None,
+        'unread': None,
+        'source': 'dom',
+        'screenshot': screenshot_path
+    }
+
+
+async def collect_conversation(page, username, run):
+    """Open a conversation (by saved URL when we know it, otherwise via inbox search) and extract it"""
+    result = {'username': username, 'data': None, 'error': None, 'error_details': None}
+    conversation_found = False
+    conversation_index = run.conversation_index
+    
+    try:
+        # Known threads skip the inbox round trip and text search entirely
+        known_thread = conversation_index.get(username) if conversation_index else None
+        if known_thread:
+            conversation_found = await open_known_conversation(page, username, known_thread, run)
+            if not conversation_found:
+                print(f"Saved conversation for {username} looks stale, searching the inbox instead")
+                conversation_index.forget(username)
         
-        # Wait for and fill login form
-        await page.wait_for_selector('input[name="username"]')
-        await page.fill('input[name="username"]', INSTAGRAM_USERNAME)
-        await page.fill('input[name="password"]', INSTAGRAM_PASSWORD)
+        if not conversation_found:
+            try:
+                conversation_found = await open_conversation_via_search(page, username, run)
+            except Exception as find_error:
+                print(f"Could not find conversation with '{username}': {find_error}")
+                result['error'] = f"Could not find conversation with '{username}'"
+                result['error_details'] = str(find_error)
+                return result
+            
+            if not conversation_found:
+                print(f"⚠️ Clicked on {username} but didn't navigate to conversation")
+                result['error'] = f"Could click on '{username}' but didn't open conversation"
+                return result
         
-        # Take screenshot of login page
-        await page.screenshot(path="1_login_page.png")
-        print("✅ Screenshot saved: 1_login_page.png")
+        print(f"✅ Successfully opened conversation with {username}: {page.url}")
+        result['data'] = await extract_conversation(page, username, run)
+        if conversation_index is not None:
+            conversation_index.record(username, result['data']['conversation_id'], result['data']['url'])
+        if run.checkpoints is not None and result['data']['messages']:
+            run.checkpoints.advance(result['data']['conversation_id'], result['data']['messages'][-1])
+    
+    except Exception as e:
+        print(f"Error processing conversation with '{username}': {e}")
+        result['error'] = f"Failed to process conversation with '{username}'"
+        result['error_details'] = str(e)
+    
+    return result
+
+
+async def collect_conversation_within_budget(page, username, run, breaker, ends):
+    """collect_conversation bounded in time, retried with backoff, and skipped once the breaker opens or time runs out"""
+    # Bytes are counted context-wide, so with concurrent pages they're only approximate per conversation
+    bytes_before = run.bytes_received
+    with run.tracer.span("conversation", username=username) as span:
+        result, attempts = await _collect_conversation_attempts(page, username, run, breaker, ends)
+        data = result['data']
+        span.set(
+            retries=max(attempts - 1, 0),
+            bytes_received=run.bytes_received - bytes_before,
+            source=data.get('source') if data else None,
+            messages=len(data['messages']) if data else 0
+        )
+        if data is None:
+            span.fail(result['error'])
+    return result
+
+
+async def _collect_conversation_attempts(page, username, run, breaker, ends):
+    """Returns (result, attempts made)"""
+    attempt = 0
+    for attempt in range(1, CONVERSATION_RETRIES + 2):
+        if breaker.open:
+            return {'username': username, 'data': None, 'error_details': None, 'skipped': True,
+                    'error': "Skipped: Instagram looks degraded after repeated failures"}, attempt - 1
+        remaining = ends - time.monotonic()
+        if remaining <= 0:
+            return {'username': username, 'data': None, 'error_details': None, 'skipped': True,
+                    'error': "Skipped: run deadline reached"}, attempt - 1
+        try:
+            result = await asyncio.wait_for(
+                collect_conversation(page, username, run), timeout=min(CONVERSATION_TIMEOUT, remaining)
+            )
+        except asyncio.TimeoutError:
+            result = {'username': username, 'data': None, 'error_details': None,
+                      'error': f"Timed out collecting conversation with '{username}'"}
+        if result['data'] is not None:
+            breaker.record(True)
+            return result, attempt
         
-        # Click login button
-        await page.click('button[type="submit"]')
-        print("Clicked login button, waiting for home page...")
+        delay = backoff_delay(attempt)
+        if attempt > CONVERSATION_RETRIES or time.monotonic() + delay >= ends:
+            break
+        print(f"🔁 Retrying '{username}' in {delay:.1f}s after: {result['error']}")
+        await asyncio.sleep(delay)
+    breaker.record(False)
+    return result, attempt
+
+
+async def collect_conversations(context, page, target_usernames, run, concurrency=1, on_result=None):
+    """Collect every target conversation, optionally on several pages of the same context at once.
+    
+    Results come back in the same order as target_usernames regardless of which page finished first.
+    on_result(index, result) is called as each conversation finishes.
+    """
+    # Conversations share one stage budget; threads left when it runs out are skipped, not started
+    budget = run.budget.stage_budget("conversations") if run.budget else float("inf")
+    start = time.monotonic()
+    ends = start + budget
+    breaker = CircuitBreaker()
+    try:
+        with run.tracer.span("conversations", threads=len(target_usernames)):
+            return await _collect_conversations(
+                context, page, target_usernames, run, concurrency, on_result, breaker, ends
+            )
+    finally:
+        if run.budget:
+            run.budget.record("conversations", budget, start, len(target_usernames), not breaker.open)
+
+
+async def _collect_conversations(context, page, target_usernames, run, concurrency, on_result, breaker, ends):
+    if concurrency <= 1 or len(target_usernames) <= 1:
+        results = []
+        for i, username in enumerate(target_usernames):
+            print(f"\n[{i+1}/{len(target_usernames)}] 🔍 Searching for conversation with '{username}'...")
+            results.append(await collect_conversation_within_budget(page, username, run, breaker, ends))
+            if on_result:
+                on_result(i, results[-1])
+        return results
+    
+    # The main page is already on the inbox, open the rest next to it
+    worker_count = min(concurrency, len(target_usernames))
+    print(f"Opening {worker_count} pages to collect conversations concurrently...")
+    extra_pages = [await context.new_page() for _ in range(worker_count - 1)]
+    if run.request_blocker:
+        for worker_page in extra_pages:
+            await run.request_blocker.attach(worker_page)
+    if run.response_capture:
+        for worker_page in extra_pages:
+            run.response_capture.attach(worker_page)
+    idle_pages = asyncio.Queue()
+    for worker_page in [page] + extra_pages:
+        idle_pages.put_nowait(worker_page)
+    semaphore = asyncio.Semaphore(worker_count)
+    
+    async def collect_with_page(i, username):
+        async with semaphore:
+            worker_page = await idle_pages.get()
+            try:
+                print(f"\n[{i+1}/{len(target_usernames)}] 🔍 Searching for conversation with '{username}'...")
+                result = await collect_conversation_within_budget(worker_page, username, run, breaker, ends)
+                if on_result:
+                    on_result(i, result)
+                return result
+            finally:
+                idle_pages.put_nowait(worker_page)
+    
+    try:
+        # gather keeps input order, so the report stays deterministic
+        return await asyncio.gather(*(collect_with_page(i, username) for i, username in enumerate(target_usernames)))
+    finally:
+        for worker_page in extra_pages:
+            try:
+                await worker_page.close()
+            except Exception as e:
+                print(f"Error closing extra page: {e}")
+
+
+class InstagramSession:
+    """A logged-in browser that stays warm between polls, so later polls only refresh the inbox"""
+    
+    def __init__(self, headless=HEADLESS, username=None, password=None):
+        self.headless = headless
+        self.username = username or INSTAGRAM_USERNAME
+        self.password = password or INSTAGRAM_PASSWORD
+        self.playwright = None
+        self.browser = None
+        self.context = None
+        self.page = None
+        self.request_blocker = None
+        self.popup_interceptor = None
+        self.run = None
+        self.stored_session = None
+        self.on_dm_page = False
+        self.logged_in = False
+        # Whether this poll already submitted the login form
+        self.form_login_attempted = False
+        # Page loads the current poll may use (None for no limit), and the count when it started
+        self.page_load_allowance = None
+        self.poll_started_page_loads = 0
+        # Most recent inbox threads read, for callers that want previews
+        self.inbox_threads = []
+        # Top-level document loads across all pages, for the monitor's rate budget
+        self.page_loads = 0
+    
+    async def start(self):
+        """Launch the browser and set up the context, but don't log in yet"""
+        print("Starting browser...")
+        self.playwright = await async_playwright().start()
+        self.browser = await self.playwright.chromium.launch(headless=self.headless)
+        # Load cookies/localStorage from the last successful login if we have them
+        self.stored_session = load_session(self.username)
+        self.context = await self.browser.new_context(
+            viewport={"width": 1280, "height": 800},
+            user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36",
+            storage_state=self.stored_session
+        )
+        self.context.on("request", self._count_page_load)
+        self.context.on("response", self._count_bytes)
+        self.request_blocker = RequestBlocker(REQUEST_BLOCK_PROFILE)
+        await self.request_blocker.install(self.context)
+        # Dismisses cookie/save-login/notification/etc. dialogs on every page as they appear
+        self.popup_interceptor = PopupInterceptor()
+        await self.popup_interceptor.install(self.context)
+        self.page = await self.context.new_page()
+        await self.request_blocker.attach(self.page)
+        # Keep the inbox/thread JSON the web client fetches so we can skip DOM scraping
+        response_capture = DirectResponseCapture()
+        response_capture.attach(self.page)
+        self.run = RunContext(
+            conversation_index=ConversationIndex.load(self.username),
+            response_capture=response_capture,
+            selectors=SelectorStrategy.load(),
+            checkpoints=MessageCheckpoints.load(self.username),
+            inbox_fingerprints=InboxFingerprints.load(self.username),
+            account=self.username,
+            request_blocker=self.request_blocker
+        )
+    
+    async def login(self):
+        """Reuse the saved session if it's still valid, otherwise log in, then confirm the home page loaded"""
+        page, run = self.page, self.run
         
-        # Handle verification if needed
-        try:
-            verification_selector = 'input[name="verificationCode"], input[placeholder*="code"]'
-            verify_element = await page.wait_for_selector(verification_selector, timeout=8000)
-            
-            if verify_element:
-                await page.screenshot(path="2_verification_page.png")
-                print("\n⚠️ Verification required!")
-                print("✅ Screenshot saved: 2_verification_page.png")
-                print("Please check your email for a code, enter it in the browser")
-                print("Waiting for you to complete verification (60 seconds)...")
-                
-                # Wait for user to enter verification code and click continue
-                await page.wait_for_selector('svg[aria-label="Home"], a[href="/direct/inbox/"]', timeout=60000)
-        except:
-            # No verification needed, continue
-            print("No verification needed, continuing...")
+        # Step 1: Reuse the saved session if it's still valid, otherwise log in
+        session_restored = False
+        if self.stored_session:
+            print("\n🔑 Found saved session, checking that it is still valid...")
+            with run.tracer.span("session_check"):
+                session_restored = await is_session_valid(page, HOME_URL)
+            if session_restored:
+                print("✅ Saved session is still valid, skipping login")
+            else:
+                print("Saved session has expired, falling back to full login")
+                clear_session(self.username)
+                self.stored_session = None
+
+        if not session_restored and not self.form_login_attempted:
+            # At most one form submit per poll, repeated logins are what trigger Instagram's challenge flow.
+            # A retry of this stage after the submit only redoes the home page load below.
+            self.form_login_attempted = True
+            with run.tracer.span("form_login"):
+                try:
+                    await login_to_instagram(page, run, self.username, self.password)
+                except Exception as e:
+                    raise PermanentFailure(f"Form login failed: {e}") from e
         
         # Step 2: First navigate to home page (more reliable)
         print("\n🏠 Navigating to Instagram home page...")
+        home_span = run.tracer.start_span("home_load", session_restored=session_restored)
         try:
-            # Navigate to home page but DON'T wait for networkidle (which often times out)
-            await page.goto("https://www.instagram.com/", timeout=15000)
+            # The session check already left us on the home page
+            if not session_restored:
+                # Navigate to home page but DON'T wait for networkidle (which often times out)
+                await page.goto(HOME_URL, timeout=15000)
             # Just wait for basic page load 
             await page.wait_for_load_state("domcontentloaded", timeout=10000)
             
             print("Basic page loaded, now checking for UI indicators...")
             
-            # Wait for home page to load - look for multiple possible indicators
-            home_loaded = False
-            for selector in ['svg[aria-label="Home"]', 'a[href="/explore/"]', 'svg[aria-label="Search"]', '[aria-label="Search"]', '[aria-label="Home"]']:
-                try:
-                    await page.wait_for_selector(selector, timeout=3000)
-                    home_loaded = True
-                    print(f"✅ Home page loaded, found indicator: {selector}")
-                    break
-                except Exception as e:
-                    print(f"Didn't find selector '{selector}': {e}")
-                    continue
+            # Wait for home page to load - race all the possible indicators
+            home_selectors = ['svg[aria-label="Home"]', 'a[href="/explore/"]', 'svg[aria-label="Search"]', '[aria-label="Search"]', '[aria-label="Home"]']
+            home_indicator, selector = await run.selectors.find(page, "home", home_selectors, timeout=5000)
+            home_loaded = home_indicator is not None
+            home_span.set(selector=selector)
+            if home_loaded:
+                print(f"✅ Home page loaded, found indicator: {selector}")
+            else:
+                print("Didn't find any home page indicator")
 
             if not home_loaded:
                 # Try one more approach - check if we can find feed elements
@@ -110,28 +643,31 @@ async def run_instagram_workflow():
             
             if not home_loaded:
                 raise Exception("Could not confirm successful login to home page - visual indicators missing")
+            
+            # Login worked, keep the session so the next run can skip it
+            if not session_restored:
+                try:
+                    self.stored_session = await save_session(self.context, self.username)
+                except Exception as e:
+                    print(f"Could not save session: {e}")
                 
             # Take screenshot of home page
             await page.screenshot(path="2_home_page.png")
             print("✅ Screenshot saved: 2_home_page.png")
+            self.logged_in = True
+            home_span.finish()
             
-            # Handle any popups that appear right after login
-            print("Checking for popups on home page...")
-            for popup_attempt in range(2):
-                try:
-                    popup_selector = 'button:has-text("Not Now"), button:has-text("Skip"), button:has-text("Not now")'
-                    popup_button = await page.wait_for_selector(popup_selector, timeout=3000)
-                    if popup_button:
-                        await popup_button.click()
-                        print(f"✅ Dismissed popup on home page (attempt {popup_attempt+1})")
-                        await page.wait_for_timeout(1000)
-                except Exception as e:
-                    print(f"No popup detected or error: {e}")
-                    break
-            
-            # NOW navigate to direct messages
-            print("\n📨 Navigating to Instagram DMs...")
-            
+        except Exception as e:
+            home_span.finish(error=e)
+            print(f"Error loading home page: {e}")
+            raise Exception("Login to Instagram failed")
+    
+    async def navigate_to_dms(self):
+        """Get from the home page to the DM inbox"""
+        page, run = self.page, self.run
+        
+        print("\n📨 Navigating to Instagram DMs...")
+        try:
             dm_clicked = False
             
             # Try multiple DM navigation approaches
@@ -144,19 +680,17 @@ async def run_instagram_workflow():
                 'svg[aria-label="Messages"]'
             ]
             
-            for dm_selector in dm_selectors:
+            print("Looking for DM icon...")
+            dm_button, dm_selector = await run.selectors.find(page, "dm_icon", dm_selectors, timeout=3000)
+            if dm_button:
                 try:
-                    print(f"Looking for DM icon with selector: {dm_selector}")
-                    dm_button = await page.wait_for_selector(dm_selector, timeout=2000)
-                    if dm_button:
-                        await dm_button.click()
-                        print(f"✅ Clicked on DM icon using selector: {dm_selector}")
-                        dm_clicked = True
-                        await page.wait_for_timeout(3000)  # Wait for navigation
-                        break
+                    await dm_button.click()
+                    print(f"✅ Clicked on DM icon using selector: {dm_selector}")
+                    dm_clicked = True
+                    run.tracer.annotate(method="icon", selector=dm_selector)
+                    await run.readiness.url_contains(page, "/direct/")
                 except Exception as e:
                     print(f"Couldn't click DM with selector {dm_selector}: {e}")
-                    continue
             
             # Approach 2: Try clicking on the paper airplane icon
             if not dm_clicked:
@@ -178,7 +712,8 @@ async def run_instagram_workflow():
                     }
                     ''')
                     dm_clicked = True
-                    await page.wait_for_timeout(3000)  # Wait for navigation
+                    run.tracer.annotate(method="paper_airplane")
+                    await run.readiness.url_contains(page, "/direct/")
                     print("✅ Clicked on paper airplane icon")
                 except Exception as e:
                     print(f"Could not find paper airplane icon: {e}")
@@ -186,9 +721,10 @@ async def run_instagram_workflow():
             # Approach 3: Try direct URL navigation as last resort
             if not dm_clicked:
                 print("Could not find DM icon, trying direct navigation...")
-                await page.goto("https://www.instagram.com/direct/inbox/", timeout=15000)
+                await page.goto(INBOX_URL, timeout=15000)
                 await page.wait_for_load_state("domcontentloaded", timeout=10000)  # Just wait for DOM, not networkidle
                 print("✅ Navigated directly to inbox URL")
+                run.tracer.annotate(method="url")
             
             # Verify we're on the DMs page
             dm_page_loaded = False
@@ -199,358 +735,359 @@ async def run_instagram_workflow():
                 print("✅ DM page confirmed via URL check")
             else:
                 # Try visual indicators
-                for indicator in ['[aria-label="Chats"]', 'div[role="listbox"]', 'div[aria-label="Messages"]']:
-                    try:
-                        await page.wait_for_selector(indicator, timeout=3000)
-                        dm_page_loaded = True
-                        print(f"✅ DM page loaded, found indicator: {indicator}")
-                        break
-                    except:
-                        continue
-            
-            # Handle any notification popups immediately
-            await page.wait_for_timeout(2000)  # Brief pause to allow popups to appear
+                dm_indicators = ['[aria-label="Chats"]', 'div[role="listbox"]', 'div[aria-label="Messages"]']
+                dm_indicator, indicator = await run.selectors.find(page, "dm_page", dm_indicators, timeout=3000)
+                if dm_indicator:
+                    dm_page_loaded = True
+                    print(f"✅ DM page loaded, found indicator: {indicator}")
             
-            print("Checking for notification popups after DM navigation...")
-            notification_selectors = [
-                'button:has-text("Not Now")', 
-                'button:has-text("Not now")',
-                'button:has-text("Skip")',
-                'button:has-text("Cancel")'
-            ]
-            
-            for selector in notification_selectors:
-                try:
-                    button = await page.wait_for_selector(selector, timeout=2000)
-                    if button:
-                        await button.click()
-                        print(f"✅ Dismissed popup with text: {selector}")
-                        await page.wait_for_timeout(1000)
-                        break
-                except:
-                    continue
+            # Wait for the thread list to render before the screenshot
+            await run.readiness.selector(page, THREAD_LIST_SELECTOR)
             
-            # Take screenshot of DM page after popup handling
+            # Take screenshot of DM page
             await page.screenshot(path="3_dm_page.png")
             print("✅ Screenshot saved: 3_dm_page.png")
             
         except Exception as e:
             print(f"Error navigating to DMs: {e}")
             raise Exception("Navigation to Instagram DMs failed")
+    
+    def _count_bytes(self, response):
+        length = response.headers.get("content-length")
+        if self.run and length and length.isdigit():
+            self.run.bytes_received += int(length)
+    
+    def _count_page_load(self, request):
+        if request.resource_type == "document" and request.frame.parent_frame is None:
+            self.page_loads += 1
+    
+    async def inbox_fingerprint(self):
+        """Load only the inbox and fingerprint its top threads, or return None if we didn't land on a logged-in inbox"""
+        page, run = self.page, self.run
         
-        print("\n🛡️ Running comprehensive popup check after navigation...")
-
-        # Multiple popup handling attempts with different methods
-        for attempt in range(3):  # Try up to 3 times to catch any popups
+        print("\n🔄 Loading inbox...")
+        inbox_response = None
+        # The inbox payload is cheaper and more reliable to read than the rendered rows
+        payload = asyncio.ensure_future(page.wait_for_event(
+            "response",
+            predicate=lambda response: DIRECT_API_PATH in response.url and "/inbox" in response.url,
+            timeout=run.readiness.timeouts["selector"]
+        ))
+        try:
+            await page.goto(INBOX_URL, timeout=15000)
+            if "/direct/" in page.url:
+                # The payload normally lands before the rows render, once they have it only gets a moment more
+                await run.readiness.selector(page, THREAD_LIST_SELECTOR)
+                inbox_response = await asyncio.wait_for(payload, INBOX_PAYLOAD_GRACE)
+                run.response_capture.ingest(await inbox_response.json())
+        except Exception as e:
+            inbox_response = None
+            print(f"No inbox payload, reading the thread list instead ({e or type(e).__name__})")
+        finally:
+            payload.cancel()
+            await asyncio.gather(payload, return_exceptions=True)
+        
+        if "/direct/" not in page.url:
+            # Sent somewhere else (e.g. logged out), go through the full flow
+            print(f"Inbox load landed on {page.url}")
+            self.on_dm_page = False
+            self.logged_in = False
+            return None
+        self.on_dm_page = True
+        self.logged_in = True
+        
+        if inbox_response is not None:
+            threads = run.response_capture.inbox_threads()
+        else:
+            # Only the first screen of rows, changed threads float to the top
+            threads = await enumerate_inbox(
+                page, run, THREAD_LIST_SELECTOR, max_threads=FINGERPRINT_THREADS, max_scrolls=0, use_network=False
+            )
+        self.inbox_threads = threads
+        return inbox_fingerprint(threads)
+    
+    async def run_stage(self, stage, coroutine_fn, retries=STAGE_RETRIES):
+        """Run a stage through the poll's budget, inside its own span"""
+        budget = self.run.budget
+        with self.run.tracer.span(stage) as span:
             try:
-                # Check for "Save Login Info" dialog - FIXED without timeout parameter
-                save_info_button = await page.query_selector('button:has-text("Not Now"), button:has-text("Skip"), button:has-text("Not now")')
-                if save_info_button:
-                    await save_info_button.click()
-                    print(f"✅ Dismissed 'Save Login Info' popup (attempt {attempt+1})")
-                    await page.wait_for_timeout(1000)
-                    continue  # Check for more popups
-                    
-                # Check for notification permission dialog
-                notif_button = await page.query_selector('button:has-text("Not Now"), button:has-text("Cancel"), div[role="dialog"] button:first-of-type')
-                if notif_button:
-                    await notif_button.click()
-                    print(f"✅ Dismissed notification dialog (attempt {attempt+1})")
-                    await page.wait_for_timeout(1000)
-                    continue  # Check for more popups
-                    
-                # Check for the annoying "Switch to Professional Account" popup
-                pro_button = await page.query_selector('button:has-text("Not Now"), [aria-label="Close"]')
-                if pro_button:
-                    await pro_button.click()
-                    print(f"✅ Dismissed 'Switch to Professional Account' popup (attempt {attempt+1})")
-                    await page.wait_for_timeout(1000)
-                    continue  # Check for more popups
-                    
-                # Check for login popup (which can appear randomly)
-                login_popup = await page.query_selector('div[role="dialog"] img[alt="Instagram"]')
-                if (login_popup):
-                    print(f"⚠️ Login popup detected (attempt {attempt+1})")
-                    
-                    # Try clicking outside the dialog
-                    await page.mouse.click(50, 50)  # Click in top left corner outside dialog
-                    print("✅ Clicked outside login dialog")
-                    await page.wait_for_timeout(1000)
-                    continue  # Check if popup was dismissed
-                    
-                # No popups found on this attempt
-                print(f"✓ No popups detected on attempt {attempt+1}")
-                
-                # If this is not the first attempt and we didn't find popups, we can stop checking
-                if attempt > 0:
-                    break
-                    
-            except Exception as e:
-                print(f"Error during popup check {attempt+1}: {e}")
-                # Continue to next attempt
-                
-        print("✅ Popup check complete, continuing with DM interaction...")
-
-        # Replace your single-conversation username code with this multi-conversation loop:
-
+                return await budget.run_stage(stage, coroutine_fn, retries=retries)
+            finally:
+                if budget.stages and budget.stages[-1]['stage'] == stage:
+                    span.set(attempts=budget.stages[-1]['attempts'], budget_s=budget.stages[-1]['budget_s'])
+    
+    def export_metrics(self, page_loads_before, popups_before, blocked_before):
+        """Write this poll's spans and counters as JSON and as a Prometheus textfile"""
+        tracer = self.run.tracer
+        tracer.gauge("bytes_received", self.run.bytes_received)
+        tracer.gauge("page_loads", self.page_loads - page_loads_before)
+        for kind, count in (self.popup_interceptor.dismissed - popups_before).items():
+            tracer.gauge("popups_dismissed", count, kind=kind)
+        for kind, count in (self.request_blocker.blocked - blocked_before).items():
+            tracer.gauge("requests_blocked", count, resource_type=kind)
+        try:
+            print(f"📈 Metrics written to {tracer.export_json()} and {tracer.export_prometheus()}")
+        except Exception as e:
+            print(f"Error exporting metrics: {e}")
+    
+    async def poll(self, max_page_loads=None):
+        """Check the inbox once, collect changed threads and write the report. Returns a summary dict.
+        
+        The whole poll runs against one deadline (run_budget.RUN_DEADLINE) split across its stages.
+        With max_page_loads, threads past what the poll may still load are left for a later poll.
+        """
+        # Timings, spans and the deadline are per poll, everything else carries over
+        self.run.readiness = ReadinessWaiter()
+        self.run.budget = RunBudget()
+        self.run.tracer = Tracer(self.username)
+        self.run.bytes_received = 0
+        self.form_login_attempted = False
+        self.page_load_allowance = max_page_loads
+        self.poll_started_page_loads = self.page_loads
+        # History captured in an earlier poll may have a gap up to now, so threads must be fetched again
+        self.run.response_capture.reset()
+        page_loads_before = self.page_loads
+        popups_before = self.popup_interceptor.dismissed.copy()
+        blocked_before = self.request_blocker.blocked.copy()
+        try:
+            # Fast path: with a warm page or a saved session, look at the inbox alone first
+            if self.on_dm_page or self.stored_session:
+                fingerprint = None
+                try:
+                    fingerprint = await self.run_stage("inbox_check", self.inbox_fingerprint, retries=0)
+                except DeadlineExceeded as e:
+                    print(f"{e}, going through the full flow")
+                    self.on_dm_page = False
+                if self.run.inbox_fingerprints.matches(fingerprint):
+                    return self.unchanged_result()
+            if not self.on_dm_page:
+                await self.run_stage("login", self.login)
+                await self.run_stage("navigate", self.navigate_to_dms)
+                self.on_dm_page = True
+            return await self.collect_and_report()
+        except Exception as e:
+            # Handle errors and take error screenshot
+            print(f"\n❌ Error: {e}")
+            self.on_dm_page = False
+            try:
+                await self.page.screenshot(path="error_state.png")
+                print("Error screenshot saved to error_state.png")
+            except:
+                print("Could not save error screenshot")
+            raise
+        finally:
+            self.run.selectors.save()
+            self.export_metrics(page_loads_before, popups_before, blocked_before)
+    
+    def unchanged_result(self):
+        """Poll result for an inbox that looks exactly like it did after the last complete run"""
+        print("✅ Inbox unchanged since the last run, nothing to collect")
+        self.run.tracer.gauge("inbox_unchanged", 1)
+        return {
+            'checked_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'threads_checked': 0,
+            'conversations_found': 0,
+            'new_messages': 0,
+            'unread_count': self.run.inbox_fingerprints.get().get('unread_count', 0),
+            'report': None,
+            'records': None,
+            'conversations': [],
+            'summaries': {},
+            'summary_usage': None,
+            'unchanged': True
+        }
+    
+    async def collect_and_report(self):
+        """Collect the threads that need checking, store them and write the report"""
+        page, run = self.page, self.run
+        
         print("\n👤 Starting multi-conversation data collection...")
+        run.tracer.gauge("inbox_unchanged", 0)
 
-        # Define our target usernames - adjust as needed
-        target_usernames = ["divit", "cheesepizzalover911", "rosescanbebluetoo", "S.A.M"]
-        all_conversation_data = []  # To store data from each conversation
+        # Only open threads that are unread or changed, unless specific usernames were asked for
+        inbox_threads = []
+        if TARGET_USERNAMES:
+            target_usernames = TARGET_USERNAMES
+        else:
+            inbox_threads = await self.run_stage(
+                "inbox", lambda: enumerate_inbox(page, run, THREAD_LIST_SELECTOR), retries=1
+            )
+            self.inbox_threads = inbox_threads
+            changed_threads = select_changed_threads(inbox_threads, run.conversation_index)
+            print(f"{len(changed_threads)} of {len(inbox_threads)} inbox threads are unread or changed since last run")
+            target_usernames = [thread['display_name'] for thread in changed_threads]
 
-        # Create the report file
-        import time
-        multi_report_filename = "instagram_dm_multi_report.txt"
+        # Pick up where an interrupted run left off instead of redoing the threads it finished,
+        # unless a thread changed since it was journaled
+        previews = {thread['display_name']: thread['preview'] for thread in inbox_threads}
+        resume = unfinished_run(self.username, previews=previews)
+        completed = resume[1] if resume else []
+        if completed:
+            done = {record['username'] for record in completed}
+            target_usernames = [username for username in target_usernames if username not in done]
+            print(f"♻️ Resuming interrupted run: {len(completed)} conversations already collected, {len(target_usernames)} to go")
+        
+        # Opening a thread costs about one page load; threads past the allowance are deferred, and the
+        # journal left unfinished below makes the next poll resume with them
+        deferred = []
+        if self.page_load_allowance is not None:
+            allowance = max(self.page_load_allowance - (self.page_loads - self.poll_started_page_loads), 0)
+            if len(target_usernames) > allowance:
+                target_usernames, deferred = target_usernames[:allowance], target_usernames[allowance:]
+                print(f"📅 Page load budget leaves room for {allowance} threads, deferring {len(deferred)} to a later poll")
+        
+        # Each conversation is written out as soon as it finishes, so a crash keeps what was collected
+        report_writer = ReportWriter(self.username, resume=resume)
+        first_index = max((record['index'] for record in completed), default=-1) + 1
+        
+        def on_result(i, result):
+            # The preview the thread had when collected, so a resumed run can tell whether it moved since
+            report_writer.write_conversation(first_index + i, {**result, 'preview': previews.get(result['username'])})
+            # Persist progress alongside the record, so a resumed run doesn't report these messages again
+            run.conversation_index.save()
+            run.checkpoints.save()
+        
+        # Threads we've opened before are reopened by URL instead of searching the inbox
+        try:
+            results = await collect_conversations(
+                self.context, page, target_usernames, run, MAX_CONCURRENT_CONVERSATIONS, on_result=on_result
+            )
+        except Exception:
+            # Still render whatever finished before the failure
+            report_writer.close()
+            render_text_report(REPORT_RECORDS_FILE, TEXT_REPORT_FILE)
+            raise
+        for username in deferred:
+            results.append({'username': username, 'data': None, 'error_details': None, 'skipped': True,
+                            'error': "Skipped: hourly page-load budget reached"})
+            on_result(len(results) - 1, results[-1])
+        results = [
+            {key: record.get(key) for key in ('username', 'data', 'error', 'error_details', 'preview')}
+            for record in completed
+        ] + [{**result, 'preview': previews.get(result['username'])} for result in results]
+        
+        # Only remember previews for threads we actually collected, so failures get retried next run.
+        # Carried-over threads keep the preview they were collected at, never the live one.
+        for result in results:
+            if result['data'] and result['preview'] is not None:
+                run.conversation_index.record_preview(result['username'], result['preview'])
+        run.conversation_index.save()
+        run.checkpoints.save()
+        all_conversation_data = [result['data'] for result in results if result['data']]
 
-        with open(multi_report_filename, "w", encoding="utf-8") as report:
-            report.write("INSTAGRAM DM MULTI-CONVERSATION REPORT\n")
-            report.write("====================================\n\n")
-            report.write(f"Date: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
-            report.write(f"Account: {INSTAGRAM_USERNAME}\n\n")
-            
-            # Try each username in sequence, collecting data from all
-            for i, username in enumerate(target_usernames):
-                report.write(f"\n{'='*50}\n")
-                report.write(f"CONVERSATION #{i+1}: {username}\n")
-                report.write(f"{'='*50}\n\n")
-                
-                print(f"\n[{i+1}/{len(target_usernames)}] 🔍 Searching for conversation with '{username}'...")
-                conversation_found = False
-                
-                try:
-                    # First make sure we're at the inbox page
-                    if not "/direct/inbox/" in page.url:
-                        print("Navigating back to inbox...")
-                        await page.goto("https://www.instagram.com/direct/inbox/", timeout=15000)
-                        await page.wait_for_load_state("domcontentloaded", timeout=10000)
-                        
-                        # Handle any popups that might appear
-                        try:
-                            popup_button = await page.wait_for_selector('button:has-text("Not Now"), button:has-text("Skip")', timeout=2000)
-                            if popup_button:
-                                await popup_button.click()
-                                print("✅ Dismissed popup after navigation")
-                                await page.wait_for_timeout(1000)
-                        except:
-                            pass
-                    
-                    # Use the selector that worked for "divit" for each username
-                    username_selector = f'span:has-text("{username}")'
-                    
-                    # Try to find the conversation with longer timeout
-                    try:
-                        conversation = await page.wait_for_selector(username_selector, timeout=8000)
-                        if conversation:
-                            print(f"✅ Found '{username}' conversation!")
-                            
-                            # Take screenshot showing what we found
-                            await page.screenshot(path=f"found_{username}.png")
-                            
-                            # Try direct click first
-                            try:
-                                await conversation.click()
-                                print(f"✅ Direct click on {username} conversation")
-                                await page.wait_for_timeout(3000)
-                            except Exception as e:
-                                print(f"Direct click failed: {e}")
-                                
-                                # If direct click fails, try parent element click with JavaScript
-                                print("Trying parent element click...")
-                                await page.evaluate(f'''
-                                () => {{
-                                    const element = document.querySelector('span:has-text("{username}")');
-                                    if (element) {{
-                                        // Navigate up to find clickable container
-                                        let parent = element.parentElement;
-                                        for (let i = 0; i < 5 && parent; i++) {{
-                                            try {{
-                                                parent.click();  // Try clicking each parent
-                                                return true;
-                                            }} catch (e) {{
-                                                parent = parent.parentElement;
-                                            }}
-                                        }}
-                                    }}
-                                    return false;
-                                }}
-                                ''')
-                                print(f"✅ Attempted parent clicks for {username}")
-                                await page.wait_for_timeout(3000)
-                            
-                            # Check if navigation occurred
-                            if '/direct/t/' in page.url:
-                                print(f"✅ Successfully opened conversation with {username}: {page.url}")
-                                conversation_found = True
-                                
-                                # Take screenshot of the conversation
-                                screenshot_path = f"conversation_{username}.png"
-                                await page.screenshot(path=screenshot_path)
-                                print(f"✅ Saved conversation screenshot: {screenshot_path}")
-                                
-                                # Extract message data
-                                print(f"📝 Extracting messages from conversation with {username}...")
-                                message_data = await page.evaluate('''
-                                () => {
-                                    // Try to find message elements
-                                    const messages = [];
-                                    
-                                    // Method 1: Standard message containers
-                                    document.querySelectorAll('div[role="row"]').forEach(row => {
-                                        if (row.innerText && row.innerText.length > 0) {
-                                            messages.push({
-                                                text: row.innerText,
-                                                is_mine: row.classList.contains('xdl72j9') || 
-                                                       row.querySelector('[style*="margin-left: auto"]') !== null,
-                                                timestamp: null
-                                            });
-                                        }
-                                    });
-                                    
-                                    // Method 2: Elements with message-like styling
-                                    document.querySelectorAll('div').forEach(div => {
-                                        if (div.clientHeight > 20 && div.clientHeight < 300 &&
-                                            div.clientWidth > 50 && div.clientWidth < 500 &&
-                                            div.innerText && div.innerText.length > 0) {
-                                            
-                                            const style = window.getComputedStyle(div);
-                                            const hasStyle = style.padding !== '0px' || 
-                                                            style.borderRadius !== '0px' ||
-                                                            style.background !== 'none';
-                                            
-                                            if (hasStyle) {
-                                                const isOutgoing = style.alignSelf === 'flex-end' || 
-                                                                 div.getAttribute('style')?.includes('margin-left: auto');
-                                                
-                                                messages.push({
-                                                    text: div.innerText.trim(),
-                                                    is_mine: isOutgoing,
-                                                    timestamp: null
-                                                });
-                                            }
-                                        }
-                                    });
-                                    
-                                    // Remove duplicates
-                                    const unique = [];
-                                    const seen = new Set();
-                                    messages.forEach(msg => {
-                                        if (!seen.has(msg.text)) {
-                                            seen.add(msg.text);
-                                            unique.push(msg);
-                                        }
-                                    });
-                                    
-                                    return {
-                                        url: window.location.href,
-                                        conversation_id: window.location.href.match(/\\/t\\/(.*?)(\\/|$)/)?.[1] || '',
-                                        message_count: unique.length,
-                                        messages: unique.slice(0, 10) // Get most recent messages
-                                    };
-                                }
-                                ''')
-                                
-                                # Store important data from this conversation
-                                conversation_data = {
-                                    'username': username,
-                                    'url': message_data.get('url', ''),
-                                    'conversation_id': message_data.get('conversation_id', 'unknown'),
-                                    'message_count': message_data.get('message_count', 0),
-                                    'messages': message_data.get('messages', []),
-                                    'screenshot': screenshot_path
-                                }
-                                
-                                all_conversation_data.append(conversation_data)
-                                
-                                # Write this conversation's data to the report
-                                report.write(f"Username: {username}\n")
-                                report.write(f"URL: {conversation_data['url']}\n")
-                                report.write(f"Messages Found: {conversation_data['message_count']}\n")
-                                report.write(f"Screenshot: {screenshot_path}\n\n")
-                                
-                                # Add message content
-                                messages = conversation_data['messages']
-                                if messages:
-                                    report.write("MOST RECENT MESSAGES:\n")
-                                    report.write("-------------------\n\n")
-                                    
-                                    for idx, msg in enumerate(messages):
-                                        sender = "You" if msg.get('is_mine') else username
-                                        timestamp = f" ({msg.get('timestamp')})" if msg.get('timestamp') else ""
-                                        report.write(f"[{idx+1}] {sender}{timestamp}: {msg.get('text')}\n\n")
-                                else:
-                                    report.write("No messages could be extracted.\n")
-                                    report.write(f"Please check screenshot: {screenshot_path}\n\n")
-                            else:
-                                print(f"⚠️ Clicked on {username} but didn't navigate to conversation")
-                                report.write(f"⚠️ ERROR: Could click on '{username}' but didn't open conversation\n\n")
-                    except Exception as find_error:
-                        print(f"Could not find conversation with '{username}': {find_error}")
-                        report.write(f"⚠️ ERROR: Could not find conversation with '{username}'\n")
-                        report.write(f"Error details: {find_error}\n\n")
-                
-                except Exception as e:
-                    print(f"Error processing conversation with '{username}': {e}")
-                    report.write(f"⚠️ ERROR: Failed to process conversation with '{username}'\n")
-                    report.write(f"Error details: {e}\n\n")
-                
-                finally:
-                    # Always try to return to inbox for next iteration
-                    if conversation_found:
-                        print(f"Returning to inbox for next conversation...")
-                        try:
-                            # This is more reliable than using browser history
-                            await page.goto("https://www.instagram.com/direct/inbox/", timeout=15000)
-                            await page.wait_for_load_state("domcontentloaded", timeout=10000)
-                            await page.wait_for_timeout(2000)  # Additional wait for UI to stabilize
-                        except Exception as nav_error:
-                            print(f"Error returning to inbox: {nav_error}")
-            
-            # Add summary at the end
-            report.write("\n\nSUMMARY\n")
-            report.write("=======\n\n")
-            report.write(f"Total conversations checked: {len(target_usernames)}\n")
-            report.write(f"Conversations found: {len(all_conversation_data)}\n")
-            
-            for convo in all_conversation_data:
-                report.write(f"- {convo['username']}: {convo['message_count']} messages\n")
+        # Keep every message locally so it can be searched later without a browser
+        new_messages = 0
+        try:
+            message_store = MessageStore()
+            new_messages = message_store.save_run(self.username, all_conversation_data)
+            message_store.close()
+            print(f"💾 Stored {new_messages} new messages in {MESSAGE_STORE_FILE}")
+        except Exception as e:
+            print(f"Error storing messages: {e}")
 
-        print(f"\n✅ Multi-conversation report saved to {multi_report_filename}")
-        print(f"Successfully processed {len(all_conversation_data)} out of {len(target_usernames)} conversations")
+        # Only threads whose messages changed since they were last summarized cost an LLM call
+        summaries, summary_usage = {}, None
+        if SUMMARIZE and all_conversation_data:
+            # The LLM calls block, so they run off the event loop; the summarizer itself stops at the deadline,
+            # wait_for is only a backstop so a stuck socket can't hold the report back
+            timeout = run.budget.stage_budget("report")
+            try:
+                with run.tracer.span("summarize", threads=len(all_conversation_data)):
+                    summaries, summary_usage = await asyncio.wait_for(
+                        asyncio.to_thread(ThreadSummarizer().summarize, all_conversation_data, timeout),
+                        timeout=timeout + SUMMARY_DEADLINE_GRACE
+                    )
+            except asyncio.TimeoutError:
+                print(f"Summarizing ran past the run deadline ({timeout:.0f}s left), reporting without summaries")
+            except Exception as e:
+                print(f"Error summarizing conversations: {e}")
 
-    except Exception as e:
-        # Handle errors and take error screenshot
-        print(f"\n❌ Error: {e}")
-        try:
-            await page.screenshot(path="error_state.png")
-            print("Error screenshot saved to error_state.png")
-        except:
-            print("Could not save error screenshot")
-    
-    finally:
-    # Keep browser open for inspection
-        print("\nPress Enter to close the browser and exit...")
-    try:
-        input()  # Wait for user input
-        print("Closing browser...")
+        if inbox_threads:
+            unread_count = sum(1 for thread in inbox_threads if thread['unread'])
+        else:
+            unread_count = sum(1 for convo in all_conversation_data if convo.get('unread'))
         
-        # Close browser resources first
-        await context.close()
-        await browser.close()
-        await playwright.stop()
+        summary = {
+            'checked_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'account': self.username,
+            'inbox_threads_scanned': len(inbox_threads),
+            'threads_checked': len(results),
+            'conversations_found': len(all_conversation_data),
+            'new_messages': new_messages,
+            'unread_count': unread_count,
+            'summaries': summaries,
+            'summary_usage': summary_usage
+        }
+        skipped = [result['username'] for result in results if result.get('skipped')]
+        if skipped:
+            # Without a summary the journal stays an unfinished run, so the next poll resumes it for these
+            print(f"♻️ {len(skipped)} conversations were skipped, leaving the run open to resume")
+            report_writer.close()
+        else:
+            report_writer.write_summary(summary)
         
-        # Force immediate program termination
-        import sys
-        sys.exit(0)  # This ensures the program completely exits
+        # The text report is just a rendering of the records
+        render_text_report(REPORT_RECORDS_FILE, TEXT_REPORT_FILE)
+        print(f"\n✅ Records saved to {REPORT_RECORDS_FILE}, report rendered to {TEXT_REPORT_FILE}")
+        print(f"Successfully processed {len(all_conversation_data)} out of {len(results)} conversations")
         
-    except KeyboardInterrupt:
-        print("\nExiting due to keyboard interrupt")
-        import sys
-        sys.exit(1)
-    except Exception as close_error:
-        print(f"Error during browser cleanup: {close_error}")
-        import sys
-        sys.exit(1)
+        # Only a run that collected everything may let later polls skip this inbox state, as it leaves it
+        if not any(result['error'] for result in results):
+            opened = {result['username'] for result in results if result['data']}
+            run.inbox_fingerprints.update(inbox_fingerprint(self.inbox_threads, opened=opened), unread_count)
+            run.inbox_fingerprints.save()
+        
+        return {
+            **summary,
+            'report': TEXT_REPORT_FILE,
+            'records': REPORT_RECORDS_FILE,
+            'conversations': all_conversation_data,
+            'unchanged': False
+        }
+    
+    def print_summary(self):
+        print(f"\n🚫 {self.request_blocker.summary()}")
+        print(f"🛡️ {self.popup_interceptor.summary()}")
+        print(f"⏱️ {self.run.readiness.summary()}")
+        if self.run.budget:
+            print(f"⌛ {self.run.budget.summary()}")
+    
+    async def close(self):
+        """Close the browser and stop Playwright"""
+        print("Closing browser...")
+        if self.context:
+            await self.context.close()
+        if self.browser:
+            await self.browser.close()
+        if self.playwright:
+            await self.playwright.stop()
+
+
+async def run_instagram_workflow(keep_open=KEEP_BROWSER_OPEN):
+    """Run the complete Instagram workflow once with proper error handling"""
+    session = InstagramSession()
+    await session.start()
+    result = None
+    try:
+        result = await session.poll()
+    except Exception:
+        # Already reported by poll()
+        pass
+    finally:
+        if session.run:
+            session.print_summary()
+        if keep_open:
+            # Keep browser open for inspection
+            print("\nPress Enter to close the browser and exit...")
+            try:
+                input()  # Wait for user input
+            except (KeyboardInterrupt, EOFError):
+                pass
+        try:
+            await session.close()
+        except Exception as close_error:
+            print(f"Error during browser cleanup: {close_error}")
+    return result
 
 # Run the main function only when directly executed
 if __name__ == "__main__":
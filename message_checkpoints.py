@@ -0,0 +1,57 @@
+import hashlib
+from datetime import datetime
+
+from json_store import JsonFileStore
+
+# Newest message we've already reported for each conversation, per account
+MESSAGE_CHECKPOINTS_FILE = "message_checkpoints.json"
+
+
+def message_hash(message):
+    """Stable hash of a message's sender side and text, for content without an id"""
+    key = f"{'me' if message.get('is_mine') else 'them'}|{message.get('text', '')}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+class MessageCheckpoints(JsonFileStore):
+    """Per-conversation high-water marks so each run only extracts and reports new messages"""
+
+    description = "message checkpoints"
+
+    def __init__(self, account, path=MESSAGE_CHECKPOINTS_FILE):
+        super().__init__(path)
+        self.account = account or "default"
+        self.checkpoints = {}
+
+    def loaded(self):
+        self.checkpoints = self.data.setdefault(self.account, {})
+
+    def get(self, conversation_id):
+        """The last message we reported for a conversation, or None on first sight"""
+        return self.checkpoints.get(conversation_id)
+
+    def is_seen(self, conversation_id, message):
+        """Whether a message is at or before the conversation's high-water mark"""
+        checkpoint = self.get(conversation_id)
+        if not checkpoint:
+            return False
+        if message.get("timestamp_us") and checkpoint.get("timestamp_us"):
+            return message["timestamp_us"] <= checkpoint["timestamp_us"]
+        if message.get("id") and message.get("id") == checkpoint.get("message_id"):
+            return True
+        return message_hash(message) == checkpoint.get("hash")
+
+    def advance(self, conversation_id, newest_message):
+        """Move the high-water mark to the newest message we just reported"""
+        if not conversation_id or conversation_id == "unknown" or not newest_message:
+            return
+        self.checkpoints[conversation_id] = {
+            "message_id": newest_message.get("id"),
+            "hash": message_hash(newest_message),
+            "text": newest_message.get("text", ""),
+            "is_mine": bool(newest_message.get("is_mine")),
+            "timestamp": newest_message.get("timestamp"),
+            "timestamp_us": newest_message.get("timestamp_us"),
+            "updated": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        self.changed = True
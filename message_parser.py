@@ -0,0 +1,136 @@
+import re
+from datetime import datetime, timedelta
+
+# Lines the thread view renders around messages that aren't part of any message
+NOISE_LINES = {
+    "Enter", "Edited", "Seen", "Delivered", "Sent", "Active now", "Note...", "Your note",
+    "Messages", "Requests", "View profile", "Instagram", "Unread", "·",
+}
+
+_TIME = r"\d{1,2}:\d{2}(?: ?[AP]M)?"
+_WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+# Day separators such as "Yesterday at 23:29", "Fri 23:29", "11:03" or "Apr 10, 2025, 11:03"
+SEPARATOR_PATTERNS = [
+    re.compile(rf"^(Today|Yesterday)(?: at ({_TIME}))?$"),
+    re.compile(rf"^({'|'.join(_WEEKDAYS)})[a-z]*(?: at)? ({_TIME})$"),
+    re.compile(rf"^({_TIME})$"),
+    re.compile(rf"^([A-Z][a-z]{{2}} \d{{1,2}}(?:, \d{{4}})?)(?:,| at) ({_TIME})$"),
+]
+
+
+def _parse_time(value):
+    for fmt in ("%H:%M", "%I:%M %p", "%I:%M%p"):
+        try:
+            return datetime.strptime(value, fmt).time()
+        except ValueError:
+            continue
+    return None
+
+
+def is_separator_line(line):
+    return any(pattern.match(line) for pattern in SEPARATOR_PATTERNS)
+
+
+def resolve_separator(label, now=None):
+    """Turn a separator label into a '%Y-%m-%d %H:%M:%S' timestamp, or None if it can't be placed"""
+    now = now or datetime.now()
+    day, clock = None, None
+
+    match = SEPARATOR_PATTERNS[0].match(label)
+    if match:
+        day = now.date() - timedelta(days=0 if match.group(1) == "Today" else 1)
+        clock = match.group(2)
+    elif SEPARATOR_PATTERNS[1].match(label):
+        match = SEPARATOR_PATTERNS[1].match(label)
+        # Weekday labels are used for the past week, never for today
+        days_back = (now.weekday() - _WEEKDAYS.index(match.group(1))) % 7 or 7
+        day = now.date() - timedelta(days=days_back)
+        clock = match.group(2)
+    elif SEPARATOR_PATTERNS[2].match(label):
+        day = now.date()
+        clock = label
+    elif SEPARATOR_PATTERNS[3].match(label):
+        match = SEPARATOR_PATTERNS[3].match(label)
+        date_text = match.group(1)
+        try:
+            if "," in date_text:
+                day = datetime.strptime(date_text, "%b %d, %Y").date()
+            else:
+                day = datetime.strptime(f"{date_text} {now.year}", "%b %d %Y").date()
+        except ValueError:
+            day = None
+        clock = match.group(2)
+
+    if day is None:
+        return None
+    parsed_time = _parse_time(clock) if clock else None
+    if clock and parsed_time is None:
+        return None
+    return datetime.combine(day, parsed_time or datetime.min.time()).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _is_separator_row(lines, row):
+    """Whether a row is a day separator: only separator-like lines, none of them inside a message bubble"""
+    if not lines or not all(is_separator_line(line) for line in lines):
+        return False
+    # A message can be just "10:30" or "Yesterday"; rows without row markup carry no bubble and can't tell
+    bubble_lines = {line.strip() for line in (row.get("bubble") or "").split("\n")}
+    return not any(line in bubble_lines for line in lines)
+
+
+def _is_name_echo(line, names):
+    """Whether a line is the sender label the thread view repeats above a message (display names may add emoji)"""
+    lowered = line.lower()
+    return any(name and (lowered == name or lowered.startswith(name + " ")) for name in names)
+
+
+def parse_message_rows(rows, username, account=None, now=None):
+    """Classify raw thread rows into messages, separators and UI noise in one pass.
+
+    Rows are the {text, is_mine, timestamp, bubble} dicts the DOM extraction returns, oldest first.
+    Returns (messages, stats): messages carry text, is_mine, timestamp and edited, with
+    separator times attached to the messages that follow them.
+    """
+    names = {name.lower() for name in (username, account) if name}
+    messages = []
+    stats = {"rows": len(rows), "messages": 0, "separators": 0, "noise": 0}
+    current_time = None
+
+    for row in rows:
+        lines = [line.strip() for line in (row.get("text") or "").split("\n")]
+        lines = [line for line in lines if line]
+
+        if _is_separator_row(lines, row):
+            stats["separators"] += 1
+            current_time = resolve_separator(lines[0], now) or lines[0]
+            continue
+
+        # Rows from the inbox list that leak into the thread view carry "·" and relative times
+        if not lines or "·" in lines or all(line in NOISE_LINES for line in lines):
+            stats["noise"] += 1
+            continue
+
+        edited = "Edited" in lines
+        is_mine = bool(row.get("is_mine"))
+        # A sender label only ever sits above message text, a lone line starting with a name is the message
+        if any(line not in NOISE_LINES for line in lines[1:]) and _is_name_echo(lines[0], names):
+            echo = lines.pop(0).lower()
+            if account and (echo == account.lower() or echo.startswith(account.lower() + " ")):
+                is_mine = True
+            elif len(lines) > 0:
+                is_mine = False
+        text_lines = [line for line in lines if line not in NOISE_LINES]
+        if not text_lines:
+            stats["noise"] += 1
+            continue
+
+        messages.append({
+            "text": "\n".join(text_lines),
+            "is_mine": is_mine,
+            "timestamp": row.get("timestamp") or current_time,
+            "edited": edited,
+        })
+        stats["messages"] += 1
+
+    return messages, stats
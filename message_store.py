@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+from message_checkpoints import message_hash
+
+# Local database every run's messages are appended to
+MESSAGE_STORE_FILE = os.environ.get("INSTAGRAM_MESSAGE_DB", "instagram_messages.db")
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS accounts (
+    id INTEGER PRIMARY KEY,
+    username TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS conversations (
+    conversation_id TEXT PRIMARY KEY,
+    account_id INTEGER NOT NULL REFERENCES accounts(id),
+    username TEXT NOT NULL,
+    url TEXT,
+    last_seen TEXT
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    conversation_id TEXT NOT NULL REFERENCES conversations(conversation_id),
+    content_hash TEXT NOT NULL,
+    -- Empty string rather than NULL when unknown, so the unique key still dedupes
+    timestamp TEXT NOT NULL DEFAULT '',
+    sender TEXT NOT NULL,
+    is_mine INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    message_id TEXT,
+    collected_at TEXT NOT NULL,
+    UNIQUE (conversation_id, content_hash, timestamp)
+);
+CREATE INDEX IF NOT EXISTS messages_by_sender ON messages (sender, collected_at);
+'''
+
+# Full-text index kept in sync with the messages table
+FTS_SCHEMA = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(text, content='messages', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+'''
+
+
+class MessageStore:
+    """SQLite store of every message collected, deduplicated and full-text searchable"""
+
+    def __init__(self, path=MESSAGE_STORE_FILE):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        try:
+            self.conn.executescript(FTS_SCHEMA)
+            self.has_fts = True
+        except sqlite3.OperationalError as e:
+            # Some SQLite builds ship without FTS5, search falls back to LIKE
+            print(f"Full-text search unavailable ({e}), falling back to LIKE queries")
+            self.has_fts = False
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def save_run(self, account, conversations):
+        """Insert one run's conversations and messages in a single transaction, returning how many messages were new"""
+        collected_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        inserted = 0
+        with self.conn:
+            self.conn.execute("INSERT OR IGNORE INTO accounts (username) VALUES (?)", (account,))
+            account_id = self.conn.execute("SELECT id FROM accounts WHERE username = ?", (account,)).fetchone()["id"]
+
+            for convo in conversations:
+                conversation_id = convo.get('conversation_id')
+                if not conversation_id or conversation_id == 'unknown':
+                    continue
+                self.conn.execute(
+                    '''INSERT INTO conversations (conversation_id, account_id, username, url, last_seen)
+                       VALUES (?, ?, ?, ?, ?)
+                       ON CONFLICT (conversation_id) DO UPDATE SET
+                           username = excluded.username, url = excluded.url, last_seen = excluded.last_seen''',
+                    (conversation_id, account_id, convo['username'], convo.get('url'), collected_at)
+                )
+                rows = [
+                    (
+                        conversation_id,
+                        message_hash(msg),
+                        msg.get('timestamp') or '',
+                        account if msg.get('is_mine') else convo['username'],
+                        1 if msg.get('is_mine') else 0,
+                        msg.get('text', ''),
+                        msg.get('id'),
+                        collected_at,
+                    )
+                    for msg in convo.get('messages', [])
+                ]
+                cursor = self.conn.executemany(
+                    '''INSERT OR IGNORE INTO messages
+                       (conversation_id, content_hash, timestamp, sender, is_mine, text, message_id, collected_at)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                    rows
+                )
+                inserted += cursor.rowcount
+        return inserted
+
+    def search(self, query, sender=None, since=None, limit=50):
+        """Messages whose text matches query, newest first.
+
+        FTS5 query syntax works when available; text that isn't a valid FTS5 query is searched as a phrase.
+        """
+        if self.has_fts:
+            sql = '''SELECT m.* FROM messages_fts f JOIN messages m ON m.id = f.rowid
+                     WHERE messages_fts MATCH ?'''
+            try:
+                return self._filtered(sql, [query], sender, since, limit)
+            except sqlite3.OperationalError:
+                # Plain text such as "what's up?" trips the FTS5 parser
+                params = ['"' + query.replace('"', '""') + '"']
+        else:
+            sql = "SELECT m.* FROM messages m WHERE m.text LIKE ?"
+            params = [f"%{query}%"]
+        return self._filtered(sql, params, sender, since, limit)
+
+    def messages_from(self, sender, since=None, limit=200):
+        """Everything a given person said, newest first"""
+        return self._filtered("SELECT m.* FROM messages m WHERE 1 = 1", [], sender, since, limit)
+
+    def _filtered(self, sql, params, sender, since, limit):
+        if sender:
+            sql += " AND m.sender = ?"
+            params.append(sender)
+        # Prefer when the message was sent, falling back to when we collected it
+        if since:
+            sql += " AND COALESCE(NULLIF(m.timestamp, ''), m.collected_at) >= ?"
+            params.append(since)
+        sql += " ORDER BY COALESCE(NULLIF(m.timestamp, ''), m.collected_at) DESC, m.id DESC LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+
+def print_messages(rows):
+    for row in rows:
+        timestamp = row['timestamp'] or row['collected_at']
+        print(f"[{timestamp}] {row['sender']}: {row['text']}")
+    print(f"\n{len(rows)} message(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query collected Instagram DMs without opening a browser")
+    parser.add_argument("--db", default=MESSAGE_STORE_FILE, help="Path to the message database")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    search_parser = subparsers.add_parser("search", help="Full-text search over message text")
+    search_parser.add_argument("query")
+    search_parser.add_argument("--sender")
+    search_parser.add_argument("--days", type=int, help="Only messages from the last N days")
+
+    from_parser = subparsers.add_parser("from", help="What a given person said")
+    from_parser.add_argument("sender")
+    from_parser.add_argument("--days", type=int, default=7, help="Only messages from the last N days")
+
+    args = parser.parse_args()
+    since = None
+    if args.days:
+        since = (datetime.now() - timedelta(days=args.days)).strftime('%Y-%m-%d %H:%M:%S')
+
+    store = MessageStore(args.db)
+    try:
+        if args.command == "search":
+            print_messages(store.search(args.query, sender=args.sender, since=since))
+        else:
+            print_messages(store.messages_from(args.sender, since=since))
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""Local stand-in for the parts of Instagram the DM workflow touches, for offline benchmarking.
+
+Serves a login page, the post-login "save your login info" page, a home page, the DM inbox and
+thread pages, using the same selectors main.py relies on, plus direct_v2-style JSON endpoints
+the pages fetch the way the real web client does. Point the workflow at it with
+INSTAGRAM_BASE_URL=http://127.0.0.1:<port>.
+"""
+import argparse
+import html
+import json
+import random
+import re
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+VIEWER_PK = "1000"
+SESSION_COOKIE = "sessionid"
+
+WORDS = ("hey", "are", "you", "coming", "tonight", "lol", "that", "reel", "was", "wild", "portia",
+         "pizza", "cheese", "tomorrow", "maybe", "sure", "thanks", "see", "ya", "bro")
+
+PAGE_TEMPLATE = '''<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Instagram</title>
+<style>
+body {{ font-family: sans-serif; margin: 0; }}
+div[role="dialog"] {{ position: fixed; top: 30%; left: 30%; background: #fff; border: 1px solid #ccc; padding: 16px; }}
+.row {{ display: flex; padding: 4px 12px; }}
+.bubble {{ max-width: 40%; }}
+.mine .bubble {{ margin-left: auto; }}
+</style></head>
+<body>{body}
+<script src="/static/bundle.js"></script>
+<script>{script}</script>
+</body></html>'''
+
+# Stand-in for the web client's script bundle: big and long-cached, like the real ones, so a run
+# that disables the HTTP cache (e.g. by routing every request) shows up in the request count
+BUNDLE_JS = "/* mock client bundle */\n" + "void 0;\n" * 40000
+BUNDLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+NAV = '''<nav>
+<a href="/"><svg aria-label="Home" width="24" height="24"></svg></a>
+<a href="/explore/"><svg aria-label="Search" width="24" height="24"></svg></a>
+<a href="/direct/inbox/"><svg aria-label="Messenger" width="24" height="24"></svg></a>
+</nav>'''
+
+
+class Scenario:
+    """Generated inbox contents plus the knobs that shape a benchmark run"""
+
+    def __init__(self, threads=20, messages=30, latency_ms=0, jitter_ms=0, unread_ratio=0.2, api=True,
+                 popups=True, seed=1):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.api = api
+        self.popups = popups
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.sessions = set()
+        self.requests = 0
+
+        now_us = int(time.time() * 1_000_000)
+        self.threads = []
+        for i in range(threads):
+            username = f"friend_{i:03d}"
+            thread = {
+                "thread_id": str(340000000000 + i),
+                "username": username,
+                "user_pk": str(2000 + i),
+                "unread": self.random.random() < unread_ratio,
+                "items": [],
+            }
+            # Spread each thread's history over the last few days, newest threads first
+            start_us = now_us - (i + 1) * 3_600_000_000 - messages * 600_000_000
+            for j in range(messages):
+                self._append_item(thread, start_us + j * 600_000_000, mine=self.random.random() < 0.4)
+            self.threads.append(thread)
+
+    def _append_item(self, thread, timestamp_us, mine, text=None):
+        text = text or " ".join(self.random.choice(WORDS) for _ in range(self.random.randint(2, 12)))
+        thread["items"].append({
+            "item_id": f"{thread['thread_id']}-{len(thread['items'])}",
+            "user_id": VIEWER_PK if mine else thread["user_pk"],
+            "timestamp": timestamp_us,
+            "item_type": "text",
+            "text": text,
+        })
+
+    def add_messages(self, thread_count=1, per_thread=1):
+        """Simulate new incoming messages: they land in the oldest threads, which jump to the top"""
+        with self.lock:
+            now_us = int(time.time() * 1_000_000)
+            for thread in sorted(self.threads, key=self.last_activity)[:thread_count]:
+                for k in range(per_thread):
+                    self._append_item(thread, now_us + k, mine=False)
+                thread["unread"] = True
+
+    @staticmethod
+    def last_activity(thread):
+        return thread["items"][-1]["timestamp"] if thread["items"] else 0
+
+    def sorted_threads(self):
+        return sorted(self.threads, key=self.last_activity, reverse=True)
+
+    def find_thread(self, thread_id):
+        return next((thread for thread in self.threads if thread["thread_id"] == thread_id), None)
+
+    def thread_json(self, thread, items):
+        return {
+            "thread_id": thread["thread_id"],
+            "thread_title": thread["username"],
+            "viewer_id": VIEWER_PK,
+            "users": [{"pk": thread["user_pk"], "username": thread["username"]}],
+            "read_state": 1 if thread["unread"] else 0,
+            "last_activity_at": self.last_activity(thread),
+            "items": items,
+        }
+
+
+def render_inbox_rows(scenario):
+    rows = []
+    for thread in scenario.sorted_threads():
+        last = thread["items"][-1]["text"] if thread["items"] else ""
+        unread = '<span aria-label="Unread">Unread</span>' if thread["unread"] else ""
+        rows.append(
+            f'<div role="listitem"><a href="/direct/t/{thread["thread_id"]}/">'
+            f'<img src="/static/avatar_{thread["user_pk"]}.jpg" width="32" height="32">'
+            f'<span>{html.escape(thread["username"])}</span><br>'
+            f'<span>{html.escape(last)} · 2m</span>{unread}</a></div>'
+        )
+    return "\n".join(rows)
+
+
+def render_thread_rows(scenario, thread):
+    """Rows as the thread view renders them: day separators, sender echoes and the 'Enter' hint included"""
+    rows = []
+    last_hour = None
+    today = time.strftime("%Y-%m-%d")
+    yesterday = time.strftime("%Y-%m-%d", time.localtime(time.time() - 86400))
+    for item in thread["items"]:
+        stamp = time.localtime(item["timestamp"] / 1_000_000)
+        hour = time.strftime("%Y-%m-%d %H", stamp)
+        if hour != last_hour:
+            day, clock = time.strftime("%Y-%m-%d", stamp), time.strftime("%H:%M", stamp)
+            if day == today:
+                label = clock
+            elif day == yesterday:
+                label = f"Yesterday at {clock}"
+            else:
+                label = time.strftime("%b %d, %Y, ", stamp) + clock
+            rows.append(f'<div role="row" class="row"><div><span>{label}</span></div></div>')
+            last_hour = hour
+        mine = item["user_id"] == VIEWER_PK
+        sender = "" if mine else f'<div>{html.escape(thread["username"])}</div>'
+        rows.append(
+            f'<div role="row" class="row{" mine" if mine else ""}">'
+            f'<div class="bubble">{sender}<div dir="auto">{html.escape(item["text"])}</div><div>Enter</div></div></div>'
+        )
+    return "\n".join(rows)
+
+
+class MockInstagramHandler(BaseHTTPRequestHandler):
+    scenario = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _delay(self):
+        scenario = self.scenario
+        with scenario.lock:
+            scenario.requests += 1
+        delay_ms = scenario.latency_ms + (scenario.random.uniform(0, scenario.jitter_ms) if scenario.jitter_ms else 0)
+        if delay_ms:
+            time.sleep(delay_ms / 1000)
+
+    def _logged_in(self):
+        cookies = self.headers.get("Cookie", "")
+        match = re.search(rf"{SESSION_COOKIE}=([^;]+)", cookies)
+        return bool(match) and match.group(1) in self.scenario.sessions
+
+    def _send(self, status, body, content_type="text/html; charset=utf-8", headers=None):
+        payload = body.encode("utf-8") if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _redirect(self, location, headers=None):
+        self._send(302, "", headers={"Location": location, **(headers or {})})
+
+    def _page(self, body, script=""):
+        self._send(200, PAGE_TEMPLATE.format(body=body, script=script))
+
+    def _json(self, data):
+        self._send(200, json.dumps(data), content_type="application/json; charset=utf-8")
+
+    def do_GET(self):
+        self._delay()
+        path = urlparse(self.path).path
+        scenario = self.scenario
+
+        if path == "/static/bundle.js":
+            return self._send(200, BUNDLE_JS, content_type="application/javascript",
+                              headers={"Cache-Control": BUNDLE_CACHE_CONTROL})
+
+        if path.startswith("/static/"):
+            # A 1x1 GIF; the dm-only blocking profile should stop these ever being requested
+            return self._send(200, b"GIF89a\x01\x00\x01\x00\x00\x00\x00;", content_type="image/gif")
+
+        if path in ("/", "/accounts/login/"):
+            if self._logged_in() and path == "/":
+                dialog = ('<div role="dialog"><p>Turn on Notifications</p><button>Not Now</button></div>'
+                          if scenario.popups else "")
+                return self._page(f'{NAV}<main><h2>Stories</h2><p>Feed</p></main>{dialog}')
+            cookie_dialog = ('<div role="dialog"><p>Allow the use of cookies by Instagram?</p>'
+                             '<button>Decline optional cookies</button></div>') if scenario.popups else ""
+            return self._page(
+                '<form method="post" action="/accounts/login/">'
+                '<input name="username"><input name="password" type="password">'
+                f'<button type="submit">Log in</button></form>{cookie_dialog}',
+                # Dialogs close when their button is clicked, like the real ones
+                "document.querySelectorAll('div[role=dialog] button').forEach(b => "
+                "b.addEventListener('click', () => b.closest('div[role=dialog]').remove()));"
+            )
+
+        if not self._logged_in():
+            return self._redirect("/accounts/login/?next=%2Fdirect%2Finbox%2F")
+
+        if path == "/accounts/onetap/":
+            return self._page(
+                '<main><p>Save your login info?</p><button id="save">Save info</button>'
+                '<button id="skip">Not now</button></main>',
+                "document.getElementById('skip').onclick = () => { location.href = '/'; };"
+            )
+
+        if path == "/direct/inbox/":
+            return self._inbox_page()
+
+        match = re.match(r"^/direct/t/([^/]+)/?$", path)
+        if match:
+            thread = scenario.find_thread(match.group(1))
+            if not thread:
+                return self._send(404, "Not found")
+            with scenario.lock:
+                thread["unread"] = False
+                rows = render_thread_rows(scenario, thread)
+            script = (f"fetch('/api/v1/direct_v2/threads/{thread['thread_id']}/');" if scenario.api else "")
+            return self._page(
+                f'{NAV}<main><div role="grid" aria-label="Messages in conversation with {html.escape(thread["username"])}">'
+                f'{rows}</div></main>', script
+            )
+
+        if path == "/api/v1/direct_v2/inbox/":
+            with scenario.lock:
+                threads = [scenario.thread_json(thread, thread["items"][-1:]) for thread in scenario.sorted_threads()]
+            return self._json({"viewer": {"pk": VIEWER_PK}, "inbox": {"threads": threads}, "status": "ok"})
+
+        match = re.match(r"^/api/v1/direct_v2/threads/([^/]+)/?$", path)
+        if match:
+            thread = scenario.find_thread(match.group(1))
+            if not thread:
+                return self._send(404, "{}", content_type="application/json")
+            with scenario.lock:
+                data = scenario.thread_json(thread, list(reversed(thread["items"])))
+            return self._json({"viewer": {"pk": VIEWER_PK}, "thread": data, "status": "ok"})
+
+        self._send(404, "Not found")
+
+    def _inbox_page(self):
+        scenario = self.scenario
+        with scenario.lock:
+            rows = render_inbox_rows(scenario)
+        script = "fetch('/api/v1/direct_v2/inbox/');" if scenario.api else ""
+        return self._page(f'{NAV}<main><div aria-label="Chats" role="list">{rows}</div></main>', script)
+
+    def do_POST(self):
+        self._delay()
+        path = urlparse(self.path).path
+        self.rfile.read(int(self.headers.get("Content-Length", 0) or 0))
+
+        if path == "/accounts/login/":
+            token = secrets.token_hex(16)
+            self.scenario.sessions.add(token)
+            expires = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(time.time() + 30 * 86400))
+            cookie = f"{SESSION_COOKIE}={token}; Path=/; Expires={expires}"
+            return self._redirect("/accounts/onetap/" if self.scenario.popups else "/", {"Set-Cookie": cookie})
+
+        # Test hook: POST /__mock/new_messages?threads=N&per_thread=M
+        if path == "/__mock/new_messages":
+            params = dict(pair.split("=", 1) for pair in urlparse(self.path).query.split("&") if "=" in pair)
+            self.scenario.add_messages(int(params.get("threads", 1)), int(params.get("per_thread", 1)))
+            return self._json({"status": "ok"})
+
+        self._send(404, "Not found")
+
+
+def start_mock_server(scenario, port=0):
+    """Serve scenario on 127.0.0.1 from a background thread; returns (server, base_url)"""
+    handler = type("ScenarioHandler", (MockInstagramHandler,), {"scenario": scenario})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-instagram", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fake Instagram for offline runs of the DM workflow")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--threads", type=int, default=20, help="Conversations in the inbox")
+    parser.add_argument("--messages", type=int, default=30, help="Messages per conversation")
+    parser.add_argument("--latency-ms", type=int, default=0, help="Delay added to every response")
+    parser.add_argument("--jitter-ms", type=int, default=0, help="Random extra delay on top of the latency")
+    parser.add_argument("--unread-ratio", type=float, default=0.2)
+    parser.add_argument("--no-api", action="store_true", help="Don't serve the direct_v2 JSON, forcing DOM extraction")
+    parser.add_argument("--no-popups", action="store_true")
+    args = parser.parse_args()
+
+    scenario = Scenario(args.threads, args.messages, args.latency_ms, args.jitter_ms, args.unread_ratio,
+                        api=not args.no_api, popups=not args.no_popups)
+    server, base_url = start_mock_server(scenario, args.port)
+    print(f"Mock Instagram on {base_url} ({args.threads} threads x {args.messages} messages), "
+          f"run the workflow with INSTAGRAM_BASE_URL={base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,16 +2,97 @@
 import os
 import time
 import json
+import random
+import signal
+import asyncio
+import argparse
 import subprocess
+from collections import deque
 from datetime import datetime
+from result_cache import invalidate_messages_cache
+from report_records import load_report, REPORT_RECORDS_FILE
 
 # File to store previous state
 PREVIOUS_STATE_FILE = "previous_instagram_state.json"
 
+# Seconds between polls in daemon mode: where we start, how fast we poll during a conversation,
+# and how far we back off when nothing is happening
+DEFAULT_POLL_INTERVAL = int(os.environ.get("INSTAGRAM_POLL_INTERVAL", "300"))
+MIN_POLL_INTERVAL = int(os.environ.get("INSTAGRAM_MIN_POLL_INTERVAL", "60"))
+MAX_POLL_INTERVAL = int(os.environ.get("INSTAGRAM_MAX_POLL_INTERVAL", "3600"))
+
+# Most page loads (inbox refreshes plus thread opens) allowed per account per rolling hour
+MAX_PAGE_LOADS_PER_HOUR = int(os.environ.get("INSTAGRAM_MAX_PAGE_LOADS_PER_HOUR", "60"))
+
+class AdaptivePollScheduler:
+    """Picks the delay before the next poll from recent activity, with jitter and an hourly page-load budget"""
+    
+    def __init__(self, account, base_interval=DEFAULT_POLL_INTERVAL, min_interval=MIN_POLL_INTERVAL,
+                 max_interval=MAX_POLL_INTERVAL, max_page_loads_per_hour=MAX_PAGE_LOADS_PER_HOUR,
+                 backoff=2.0, jitter=0.2):
+        self.account = account
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_page_loads_per_hour = max_page_loads_per_hour
+        self.backoff = backoff
+        self.jitter = jitter
+        self.interval = base_interval
+        self.page_loads = deque()
+        self.last_poll_loads = 1
+    
+    def record_poll(self, had_activity, page_loads, now=None):
+        """Tighten the interval after new messages, back off exponentially while things are quiet"""
+        now = now or time.time()
+        for _ in range(page_loads):
+            self.page_loads.append(now)
+        self.last_poll_loads = max(page_loads, 1)
+        
+        previous = self.interval
+        if had_activity:
+            self.interval = self.min_interval
+            reason = "new messages"
+        else:
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+            reason = "quiet"
+        print(f"📅 [{self.account}] {reason}: interval {previous:.0f}s -> {self.interval:.0f}s")
+    
+    def loads_in_last_hour(self, now=None):
+        now = now or time.time()
+        while self.page_loads and self.page_loads[0] <= now - 3600:
+            self.page_loads.popleft()
+        return len(self.page_loads)
+    
+    def remaining_page_loads(self, now=None):
+        """Page loads still allowed this hour, for the next poll to stay within"""
+        return max(self.max_page_loads_per_hour - self.loads_in_last_hour(now), 0)
+    
+    def next_delay(self, now=None):
+        """Seconds to wait before the next poll"""
+        now = now or time.time()
+        delay = self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+        delay = max(delay, self.min_interval * (1 - self.jitter))
+        
+        # Assume the next poll costs as many page loads as the last one
+        used = self.loads_in_last_hour(now)
+        if used + self.last_poll_loads > self.max_page_loads_per_hour:
+            # Wait until enough old loads fall out of the window
+            excess = used + self.last_poll_loads - self.max_page_loads_per_hour
+            index = min(excess, len(self.page_loads)) - 1
+            budget_delay = self.page_loads[index] + 3600 - now if index >= 0 else 0
+            if budget_delay > delay:
+                print(f"📅 [{self.account}] page load budget: {used}/{self.max_page_loads_per_hour} used this hour, "
+                      f"waiting {budget_delay:.0f}s instead of {delay:.0f}s")
+                delay = budget_delay
+        
+        print(f"📅 [{self.account}] next poll in {delay:.0f}s "
+              f"({self.loads_in_last_hour(now)}/{self.max_page_loads_per_hour} page loads used this hour)")
+        return delay
+
 def run_instagram_check():
     """Run the Instagram DM checker script"""
     print(f"Running Instagram check at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    subprocess.run(["python3", "main.py"])
+    # Don't let main.py wait for Enter before closing the browser
+    subprocess.run(["python3", "main.py"], env={**os.environ, "INSTAGRAM_KEEP_BROWSER_OPEN": "0"})
 
 def load_previous_state():
     """Load previous DM state from file"""
@@ -23,25 +104,23 @@ def load_previous_state():
                 return {"unread_count": 0, "last_check": None}
     return {"unread_count": 0, "last_check": None}
 
-def save_current_state():
+def save_current_state(poll_result=None):
     """Save current DM state to file"""
-    # Read the most recent report
     try:
-        with open('instagram_dm_text_report.txt', 'r') as f:
-            content = f.read()
-            
-        # Extract unread count
-        unread_match = None
-        for line in content.split('\n'):
-            if 'Unread Count:' in line:
-                try:
-                    unread_match = int(line.split(':')[1].strip())
-                    break
-                except:
-                    pass
+        if poll_result is not None:
+            # In-process polls hand us the count directly
+            unread_count = poll_result['unread_count']
+        else:
+            # Read the summary record the run just wrote
+            _, conversations, summary = load_report(REPORT_RECORDS_FILE)
+            if summary is not None:
+                unread_count = summary['unread_count']
+            else:
+                # The run died before its summary, count what it did record
+                unread_count = sum(1 for record in conversations if record['data'] and record['data'].get('unread'))
         
         current_state = {
-            "unread_count": unread_match or 0,
+            "unread_count": unread_count or 0,
             "last_check": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
         
@@ -58,6 +137,8 @@ def check_for_new_messages(previous_state, current_state):
     if previous_state["unread_count"] < current_state["unread_count"]:
         new_messages = current_state["unread_count"] - previous_state["unread_count"]
         print(f"🔔 NEW MESSAGES DETECTED: {new_messages} new unread message(s)!")
+        # Cached tool results no longer reflect the inbox
+        invalidate_messages_cache()
         
         # On Mac, show notification
         os.system(f"""
@@ -66,7 +147,77 @@ def check_for_new_messages(previous_state, current_state):
     else:
         print("No new messages since last check.")
 
+async def run_daemon(scheduler):
+    """Keep one logged-in browser warm and poll the inbox on the scheduler's timing until SIGTERM/SIGINT"""
+    from main import InstagramSession
+    
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    
+    session = InstagramSession(headless=True)
+    await session.start()
+    print(f"🟢 Monitor daemon started, first poll interval {scheduler.interval}s")
+    try:
+        while not stop.is_set():
+            previous_state = load_previous_state()
+            print(f"\nRunning Instagram check at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+            loads_before = session.page_loads
+            had_activity = False
+            # A poll can run for the whole run deadline, longer than supervisors wait after SIGTERM
+            poll_task = asyncio.ensure_future(session.poll(max_page_loads=scheduler.remaining_page_loads()))
+            stop_task = asyncio.ensure_future(stop.wait())
+            await asyncio.wait({poll_task, stop_task}, return_when=asyncio.FIRST_COMPLETED)
+            stop_task.cancel()
+            if not poll_task.done():
+                print("Shutdown requested, cancelling the poll in progress")
+                poll_task.cancel()
+                await asyncio.gather(poll_task, return_exceptions=True)
+                break
+            try:
+                poll_result = poll_task.result()
+                session.print_summary()
+                current_state = save_current_state(poll_result)
+                if current_state:
+                    check_for_new_messages(previous_state, current_state)
+                    had_activity = (poll_result['new_messages'] > 0 or
+                                    current_state['unread_count'] > previous_state['unread_count'])
+                    if had_activity:
+                        invalidate_messages_cache()
+            except Exception as e:
+                print(f"Poll failed: {e}")
+            scheduler.record_poll(had_activity, session.page_loads - loads_before)
+            
+            # Sleep until the next poll, waking early on shutdown
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=scheduler.next_delay())
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        print("\n🛑 Shutting down monitor daemon...")
+        await session.close()
+
 def main():
+    parser = argparse.ArgumentParser(description="Check Instagram DMs and notify about new messages")
+    parser.add_argument("--daemon", action="store_true", help="Keep a warm browser and poll on a schedule instead of running once")
+    parser.add_argument("--interval", type=int, default=DEFAULT_POLL_INTERVAL, help="Starting seconds between polls in daemon mode")
+    parser.add_argument("--min-interval", type=int, default=MIN_POLL_INTERVAL, help="Shortest interval, used right after new messages")
+    parser.add_argument("--max-interval", type=int, default=MAX_POLL_INTERVAL, help="Longest interval when things are quiet")
+    parser.add_argument("--max-page-loads", type=int, default=MAX_PAGE_LOADS_PER_HOUR, help="Page load budget per account per hour")
+    args = parser.parse_args()
+    
+    if args.daemon:
+        scheduler = AdaptivePollScheduler(
+            os.environ.get("INSTAGRAM_USERNAME", "default"),
+            base_interval=args.interval,
+            min_interval=args.min_interval,
+            max_interval=args.max_interval,
+            max_page_loads_per_hour=args.max_page_loads
+        )
+        asyncio.run(run_daemon(scheduler))
+        return
+    
     # Load previous state
     previous_state = load_previous_state()
     print(f"Previous state: {previous_state['unread_count']} unread messages")
@@ -0,0 +1,148 @@
+from datetime import datetime
+
+# The web client loads the inbox and each thread from these endpoints
+DIRECT_API_PATH = "/api/v1/direct_v2/"
+
+# Newest messages kept per captured thread, older ones are never needed to find new messages
+MAX_CAPTURED_MESSAGES = 200
+
+# How non-text items are shown in reports
+ITEM_TYPE_LABELS = {
+    "like": "❤️",
+    "media": "[photo/video]",
+    "media_share": "[shared post]",
+    "clip": "[shared reel]",
+    "story_share": "[shared story]",
+    "reel_share": "[story reply]",
+    "voice_media": "[voice message]",
+    "animated_media": "[GIF]",
+    "raven_media": "[disappearing photo/video]",
+}
+
+
+def format_item_timestamp(value):
+    """Turn Instagram's microsecond epoch timestamps into local time strings"""
+    try:
+        return datetime.fromtimestamp(int(value) / 1_000_000).strftime('%Y-%m-%d %H:%M:%S')
+    except (TypeError, ValueError, OverflowError, OSError):
+        return None
+
+
+def item_text(item):
+    """Best text representation of a single thread item"""
+    item_type = item.get("item_type", "")
+    if item_type == "text":
+        return item.get("text", "")
+    if item_type == "link":
+        return item.get("link", {}).get("text", "")
+    if item_type == "action_log":
+        return item.get("action_log", {}).get("description", "")
+    return ITEM_TYPE_LABELS.get(item_type, f"[{item_type or 'unknown'}]")
+
+
+def parse_thread(thread, viewer_id=None):
+    """Convert one direct_v2 thread object into the conversation shape used by the report"""
+    viewer_id = str(thread.get("viewer_id") or viewer_id or "")
+    usernames = {str(user.get("pk")): user.get("username", "") for user in thread.get("users", [])}
+
+    messages = []
+    for item in thread.get("items", []):
+        sender_id = str(item.get("user_id", ""))
+        messages.append({
+            "id": item.get("item_id"),
+            "text": item_text(item),
+            "is_mine": bool(viewer_id) and sender_id == viewer_id,
+            "sender": usernames.get(sender_id, "You" if sender_id == viewer_id else sender_id),
+            "timestamp": format_item_timestamp(item.get("timestamp")),
+            "timestamp_us": int(item.get("timestamp") or 0),
+        })
+
+    return {
+        "conversation_id": str(thread.get("thread_id", "")),
+        "title": thread.get("thread_title", ""),
+        "usernames": [name for name in usernames.values() if name],
+        # read_state is 1 while the viewer has unread items in the thread
+        "unread": thread.get("read_state") == 1,
+        "last_activity": format_item_timestamp(thread.get("last_activity_at")),
+        "messages": messages,
+    }
+
+
+class DirectResponseCapture:
+    """Collects inbox/thread payloads the web client already fetches, so threads can be read without DOM scraping"""
+
+    def __init__(self):
+        self.viewer_id = None
+        self.threads = {}
+
+    def reset(self):
+        """Forget every captured thread, so a new poll only trusts history fetched during that poll"""
+        self.threads = {}
+
+    def attach(self, page):
+        """Start listening to a page's responses"""
+        page.on("response", self._on_response)
+
+    async def _on_response(self, response):
+        if DIRECT_API_PATH not in response.url:
+            return
+        if "json" not in response.headers.get("content-type", ""):
+            return
+        try:
+            payload = await response.json()
+        except Exception:
+            # Body can be gone if the page navigated away first
+            return
+        self.ingest(payload)
+
+    def ingest(self, payload):
+        """Merge threads from an inbox or thread payload into what we've seen so far"""
+        viewer = payload.get("viewer") or {}
+        if viewer.get("pk"):
+            self.viewer_id = str(viewer["pk"])
+
+        # Inbox payloads only carry each thread's newest item, thread payloads carry pages of history
+        threads = [(thread, False) for thread in payload.get("inbox", {}).get("threads", [])]
+        if payload.get("thread"):
+            threads.append((payload["thread"], True))
+
+        for thread, has_history in threads:
+            parsed = parse_thread(thread, self.viewer_id)
+            if not parsed["conversation_id"]:
+                continue
+            parsed["has_history"] = has_history
+            existing = self.threads.get(parsed["conversation_id"])
+            if existing:
+                merged = {m["id"]: m for m in existing["messages"]}
+                merged.update({m["id"]: m for m in parsed["messages"]})
+                parsed["messages"] = list(merged.values())
+                parsed["has_history"] = has_history or existing["has_history"]
+            parsed["messages"].sort(key=lambda m: m["timestamp_us"])
+            parsed["messages"] = parsed["messages"][-MAX_CAPTURED_MESSAGES:]
+            self.threads[parsed["conversation_id"]] = parsed
+
+    def inbox_threads(self):
+        """Every thread seen so far, newest activity first, in the shape used for inbox enumeration"""
+        threads = sorted(
+            self.threads.values(),
+            key=lambda thread: thread["messages"][-1]["timestamp_us"] if thread["messages"] else 0,
+            reverse=True
+        )
+        return [
+            {
+                "conversation_id": thread["conversation_id"],
+                # 1:1 threads are keyed by the other person's username, groups by their title
+                "display_name": thread["usernames"][0] if len(thread["usernames"]) == 1 else thread["title"],
+                "preview": thread["messages"][-1]["text"] if thread["messages"] else "",
+                "timestamp": thread["last_activity"] or (thread["messages"][-1]["timestamp"] if thread["messages"] else None),
+                "unread": thread["unread"],
+            }
+            for thread in threads
+        ]
+
+    def get_thread(self, conversation_id):
+        """Return the parsed thread for a conversation id, or None if its history payload hasn't been seen"""
+        thread = self.threads.get(str(conversation_id))
+        if thread and thread["has_history"]:
+            return thread
+        return None
@@ -0,0 +1,87 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from portia import Plan
+
+from json_store import JsonFileStore
+
+PLAN_CACHE_FILENAME = "plan_cache.json"
+
+
+def placeholder(name):
+    """Sentinel planned in place of a value, swapped for the real one on replay"""
+    return f"<<{name}>>"
+
+
+def tool_signature(tool_registry):
+    """Ids and descriptions of every tool the planner could pick from"""
+    return sorted((tool.id, tool.description) for tool in tool_registry.get_tools())
+
+
+def tool_set_hash(tool_registry):
+    """Hash of the tool set, stored with each plan so stale ones can be found"""
+    return hashlib.sha256(json.dumps(tool_signature(tool_registry)).encode("utf-8")).hexdigest()
+
+
+def plan_cache_key(template, tool_registry):
+    """Key a cached plan on the prompt template and the tool set it was planned against"""
+    key = json.dumps({"template": template, "tools": tool_signature(tool_registry)})
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class PlanCache(JsonFileStore):
+    """Plans for fixed prompt templates, planned once and replayed with new values.
+
+    Lives next to the runs in Portia's disk storage directory. A plan is keyed on the template
+    and the tool registry, so adding, removing or changing a tool forces a fresh plan.
+    """
+
+    description = "plan cache"
+
+    def __init__(self, storage_dir):
+        super().__init__(os.path.join(storage_dir, PLAN_CACHE_FILENAME))
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        super().save()
+
+    def plan_for(self, portia, template, values, tool_registry):
+        """A plan for template filled with values, from the cache when possible, otherwise planned now"""
+        key = plan_cache_key(template, tool_registry)
+        entry = self.data.get(key)
+        if entry is None:
+            print("🧭 No cached plan for this prompt and tool set, planning...")
+            template_plan = portia.plan(template.format(**{name: placeholder(name) for name in values}))
+            plan_json = template_plan.model_dump_json()
+            # Only cache plans that carry every value through as its placeholder
+            if not all(placeholder(name) in plan_json for name in values):
+                print("Planner didn't keep the placeholders, planning with the real values instead")
+                return portia.plan(template.format(**values))
+            # Drop plans made against an older tool set, other templates' plans for this one stay
+            tools = tool_set_hash(tool_registry)
+            self.data = {
+                cached_key: cached for cached_key, cached in self.data.items() if cached.get("tools") == tools
+            }
+            self.data[key] = {
+                "plan": plan_json,
+                "tools": tools,
+                "created": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            }
+            self.changed = True
+            self.save()
+            entry = self.data[key]
+        else:
+            print("🧭 Replaying cached plan")
+
+        plan_json = entry["plan"]
+        for name, value in values.items():
+            # Escape the value for its place inside JSON strings
+            plan_json = plan_json.replace(placeholder(name), json.dumps(str(value))[1:-1])
+        plan_data = json.loads(plan_json)
+        # Each replay is a plan of its own, so it gets a fresh id
+        plan_data.pop("id", None)
+        plan = Plan.model_validate(plan_data)
+        portia.storage.save_plan(plan)
+        return plan
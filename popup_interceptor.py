@@ -0,0 +1,106 @@
+from collections import Counter
+
+# Name of the binding the in-page script calls each time it dismisses something
+DISMISSED_BINDING = "__downintheDMPopupDismissed"
+
+# Runs in every page of the context from the moment the document is created. It watches for
+# the dialogs we know about and dismisses them as they appear, so no stage has to poll for them.
+POPUP_INTERCEPTOR_JS = '''
+(() => {
+    const DISMISS_TEXTS = ["Not Now", "Not now", "Skip"];
+    const COOKIE_TEXTS = ["Decline optional cookies", "Reject", "Decline"];
+
+    function findButton(root, texts) {
+        for (const button of root.querySelectorAll('button, div[role="button"]')) {
+            if (texts.includes(button.innerText.trim())) return button;
+        }
+        return null;
+    }
+
+    function dismiss(kind, button) {
+        // Don't count the same button twice if its dialog is slow to close
+        if (button.dataset && button.dataset.downintheDmDismissed) return;
+        if (button.dataset) button.dataset.downintheDmDismissed = "1";
+        button.click();
+        if (window.__downintheDMPopupDismissed) window.__downintheDMPopupDismissed(kind);
+    }
+
+    // Closing the login overlay by clicking outside it is only safe on its own backdrop: a fixed
+    // layer wrapping the dialog, never a link or control of the page underneath
+    function overlayBackdrop(dialog) {
+        const el = document.elementFromPoint(50, 50);
+        if (!el || el === document.body || el === document.documentElement) return null;
+        if (dialog.contains(el) || !el.contains(dialog)) return null;
+        if (el.closest('a, button, input, [role="button"], [role="link"]')) return null;
+        return getComputedStyle(el).position === "fixed" ? el : null;
+    }
+
+    function classify(dialog) {
+        const text = dialog.innerText || "";
+        if (/cookies/i.test(text)) return "cookies";
+        if (/save (your )?login info/i.test(text)) return "save_login";
+        if (/notifications/i.test(text)) return "notifications";
+        if (/professional account/i.test(text)) return "professional_account";
+        if (dialog.querySelector('img[alt="Instagram"]')) return "login_overlay";
+        return "other";
+    }
+
+    function check() {
+        // The post-login "save your login info" prompt is a full page rather than a dialog
+        if (location.pathname.startsWith("/accounts/onetap")) {
+            const button = findButton(document, DISMISS_TEXTS);
+            if (button) dismiss("save_login", button);
+        }
+
+        for (const dialog of document.querySelectorAll('div[role="dialog"]')) {
+            const kind = classify(dialog);
+            let button = null;
+            if (kind === "cookies") {
+                button = findButton(dialog, COOKIE_TEXTS);
+            } else if (kind === "login_overlay") {
+                button = dialog.querySelector('[aria-label="Close"]') || overlayBackdrop(dialog);
+            } else if (kind === "professional_account") {
+                button = findButton(dialog, DISMISS_TEXTS) || dialog.querySelector('[aria-label="Close"]');
+            } else {
+                button = findButton(dialog, DISMISS_TEXTS);
+            }
+            if (button) dismiss(kind, button);
+        }
+    }
+
+    // Coalesce bursts of mutations into one check per frame
+    let scheduled = false;
+    const observer = new MutationObserver(() => {
+        if (scheduled) return;
+        scheduled = true;
+        requestAnimationFrame(() => {
+            scheduled = false;
+            check();
+        });
+    });
+    observer.observe(document, {childList: true, subtree: true});
+})();
+'''
+
+
+class PopupInterceptor:
+    """Dismisses known Instagram dialogs in the background and counts what it dismissed"""
+
+    def __init__(self):
+        self.dismissed = Counter()
+
+    async def install(self, context):
+        """Register the interceptor once for every page the context opens"""
+        await context.expose_binding(DISMISSED_BINDING, self._on_dismissed)
+        await context.add_init_script(POPUP_INTERCEPTOR_JS)
+
+    def _on_dismissed(self, source, kind):
+        self.dismissed[kind] += 1
+        print(f"✅ Dismissed {kind.replace('_', ' ')} popup")
+
+    def summary(self):
+        """One-line description of the popups dismissed this run"""
+        if not self.dismissed:
+            return "No popups needed dismissing"
+        by_kind = ", ".join(f"{kind}: {count}" for kind, count in self.dismissed.most_common())
+        return f"Dismissed {sum(self.dismissed.values())} popups ({by_kind})"
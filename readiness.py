@@ -0,0 +1,81 @@
+import time
+
+# Default timeout (ms) for each kind of condition
+READINESS_TIMEOUTS = {
+    "url": 10000,
+    "selector": 8000,
+    "dom_quiet": 5000,
+}
+
+# How long (ms) a container must go without mutations before we call it settled
+DOM_QUIET_MS = 400
+
+# Resolves once the target has had no mutations for quietMs, or false after timeoutMs
+DOM_QUIET_JS = '''
+({selector, quietMs, timeoutMs}) => new Promise(resolve => {
+    const target = document.querySelector(selector) || document.body;
+    let quietTimer = null;
+    let deadline = null;
+    const observer = new MutationObserver(() => {
+        clearTimeout(quietTimer);
+        quietTimer = setTimeout(() => done(true), quietMs);
+    });
+    function done(settled) {
+        observer.disconnect();
+        clearTimeout(quietTimer);
+        clearTimeout(deadline);
+        resolve(settled);
+    }
+    observer.observe(target, {childList: true, subtree: true, characterData: true});
+    quietTimer = setTimeout(() => done(true), quietMs);
+    deadline = setTimeout(() => done(false), timeoutMs);
+})
+'''
+
+
+class ReadinessWaiter:
+    """Waits on concrete page conditions instead of fixed sleeps and records how long each wait took"""
+
+    def __init__(self, timeouts=None):
+        self.timeouts = {**READINESS_TIMEOUTS, **(timeouts or {})}
+        self.waits = []
+
+    async def _measure(self, condition, detail, awaitable):
+        start = time.monotonic()
+        try:
+            met = (await awaitable) is not False
+        except Exception:
+            met = False
+        self.waits.append({
+            "condition": condition,
+            "detail": detail,
+            "elapsed_ms": round((time.monotonic() - start) * 1000),
+            "met": met,
+        })
+        return met
+
+    async def url_contains(self, page, fragment, timeout=None):
+        """Wait until the page URL contains fragment"""
+        timeout = timeout or self.timeouts["url"]
+        return await self._measure("url", fragment, page.wait_for_url(lambda url: fragment in url, timeout=timeout))
+
+    async def selector(self, page, selector, timeout=None):
+        """Wait until an element matching selector is visible"""
+        timeout = timeout or self.timeouts["selector"]
+        return await self._measure("selector", selector, page.wait_for_selector(selector, timeout=timeout))
+
+    async def dom_quiet(self, page, selector, quiet_ms=DOM_QUIET_MS, timeout=None):
+        """Wait until the container matching selector stops mutating for quiet_ms"""
+        timeout = timeout or self.timeouts["dom_quiet"]
+        args = {"selector": selector, "quietMs": quiet_ms, "timeoutMs": timeout}
+        return await self._measure("dom_quiet", selector, page.evaluate(DOM_QUIET_JS, args))
+
+    def summary(self):
+        """One-line description of time spent waiting this run"""
+        if not self.waits:
+            return "No readiness waits recorded"
+        total_ms = sum(wait["elapsed_ms"] for wait in self.waits)
+        missed = sum(1 for wait in self.waits if not wait["met"])
+        slowest = max(self.waits, key=lambda wait: wait["elapsed_ms"])
+        return (f"Waited {total_ms / 1000:.1f}s across {len(self.waits)} readiness checks "
+                f"({missed} timed out, slowest: {slowest['condition']} '{slowest['detail']}' {slowest['elapsed_ms']}ms)")
@@ -0,0 +1,198 @@
+import json
+import os
+import time
+
+# One JSON record per line: a run header, one record per conversation as it finishes, then a run summary
+REPORT_RECORDS_FILE = "instagram_dm_report.jsonl"
+
+# Human-readable report rendered from the records
+TEXT_REPORT_FILE = "instagram_dm_multi_report.txt"
+
+# An interrupted run younger than this (seconds) is resumed instead of started over
+RESUME_WINDOW = int(os.environ.get("INSTAGRAM_RESUME_WINDOW", "21600"))
+
+
+class ReportWriter:
+    """Streams a run's records to disk as they happen, so a crash still leaves every finished thread behind.
+
+    The records double as the run's journal: pass an interrupted run (see unfinished_run) as resume
+    and its completed conversations are carried over, with new records appended after them.
+    """
+
+    def __init__(self, account, path=REPORT_RECORDS_FILE, resume=None):
+        self.path = path
+        header = {
+            "type": "run",
+            "account": account,
+            "started_at": time.strftime('%Y-%m-%d %H:%M:%S'),
+            "started_ts": time.time(),
+            "pid": os.getpid(),
+        }
+        completed = []
+        if resume:
+            run, completed = resume
+            # Keep the original start so a run that keeps crashing still ages out
+            header.update(started_at=run["started_at"], started_ts=run["started_ts"], resumed=True)
+
+        # Rewrite the journal without the old run's failed threads before appending, atomically
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for record in [header] + completed:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(temp_path, path)
+        self.file = open(path, "a", encoding="utf-8")
+
+    def _write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.file.flush()
+
+    def write_conversation(self, index, result):
+        """Record one conversation's outcome; index is its position in the run, whatever order threads finish in"""
+        self._write({"type": "conversation", "index": index, **result})
+
+    def write_summary(self, summary):
+        """Record the run summary and close the file"""
+        self._write({"type": "summary", **summary})
+        self.close()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+def load_report(path=REPORT_RECORDS_FILE):
+    """Read a records file back as (run, conversations in run order, summary or None if the run didn't finish)"""
+    run, conversations, summary = None, [], None
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash can cut the last line short
+                continue
+            if record.get("type") == "run":
+                run = record
+            elif record.get("type") == "conversation":
+                conversations.append(record)
+            elif record.get("type") == "summary":
+                summary = record
+    conversations.sort(key=lambda record: record["index"])
+    return run, conversations, summary
+
+
+def unfinished_run(account, path=REPORT_RECORDS_FILE, max_age=RESUME_WINDOW, previews=None):
+    """(run header, completed conversation records) of a recent interrupted run for account, or None.
+
+    With previews (username -> current inbox preview), a record only counts as completed while its
+    thread still shows the preview it was collected at; a thread that moved since is collected again.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        run, conversations, summary = load_report(path)
+    except Exception as e:
+        print(f"Could not read run journal {path}: {e}")
+        return None
+    if run is None or summary is not None or run.get("account") != account:
+        return None
+    if time.time() - run.get("started_ts", 0) > max_age:
+        return None
+    # Failed threads are retried, only collected ones count as done
+    completed = [record for record in conversations if record.get("data")]
+    if previews is not None:
+        completed = [record for record in completed if record.get("preview") == previews.get(record["username"])]
+    return run, completed
+
+
+def write_conversation_report(report, index, result):
+    """Write one conversation's section of the multi-conversation report"""
+    username = result['username']
+    report.write(f"\n{'='*50}\n")
+    report.write(f"CONVERSATION #{index+1}: {username}\n")
+    report.write(f"{'='*50}\n\n")
+
+    conversation_data = result['data']
+    if conversation_data is None:
+        report.write(f"⚠️ ERROR: {result['error']}\n")
+        if result.get('error_details'):
+            report.write(f"Error details: {result['error_details']}\n")
+        report.write("\n")
+        return
+
+    screenshot_path = conversation_data['screenshot']
+    report.write(f"Username: {username}\n")
+    report.write(f"URL: {conversation_data['url']}\n")
+    report.write(f"Messages Found: {conversation_data['message_count']}\n")
+    if conversation_data.get('unread') is not None:
+        report.write(f"Unread: {'Yes' if conversation_data['unread'] else 'No'}\n")
+    report.write(f"Extracted From: {conversation_data.get('source', 'dom')}\n")
+    report.write(f"Screenshot: {screenshot_path}\n\n")
+
+    # Add message content
+    messages = conversation_data['messages']
+    if conversation_data.get('incremental'):
+        report.write(f"New Messages: {len(messages)}\n\n")
+    if messages:
+        if conversation_data.get('incremental'):
+            report.write("NEW MESSAGES SINCE LAST CHECK:\n")
+            report.write("-----------------------------\n\n")
+        else:
+            report.write("MOST RECENT MESSAGES:\n")
+            report.write("-------------------\n\n")
+
+        for idx, msg in enumerate(messages):
+            sender = "You" if msg.get('is_mine') else username
+            timestamp = f" ({msg.get('timestamp')})" if msg.get('timestamp') else ""
+            report.write(f"[{idx+1}] {sender}{timestamp}: {msg.get('text')}\n\n")
+    elif conversation_data.get('incremental'):
+        report.write("No new messages since last check.\n\n")
+
+
+def render_text_report(records_path=REPORT_RECORDS_FILE, report_path=TEXT_REPORT_FILE):
+    """Render the records file as the plain-text multi-conversation report"""
+    run, conversations, summary = load_report(records_path)
+    run = run or {}
+
+    with open(report_path, "w", encoding="utf-8") as report:
+        report.write("INSTAGRAM DM MULTI-CONVERSATION REPORT\n")
+        report.write("====================================\n\n")
+        report.write(f"Date: {summary['checked_at'] if summary else run.get('started_at')}\n")
+        report.write(f"Account: {run.get('account')}\n")
+        if summary and summary.get('inbox_threads_scanned'):
+            report.write(f"Inbox threads scanned: {summary['inbox_threads_scanned']}\n")
+        report.write("\n")
+
+        for record in conversations:
+            write_conversation_report(report, record['index'], record)
+
+        # Add summary at the end
+        report.write("\n\nSUMMARY\n")
+        report.write("=======\n\n")
+        if summary is None:
+            report.write("Run did not finish, the conversations above are all that was collected.\n")
+            return report_path
+        report.write(f"Total conversations checked: {summary['threads_checked']}\n")
+        report.write(f"Conversations found: {summary['conversations_found']}\n")
+        report.write(f"Unread Count: {summary['unread_count']}\n")
+
+        summaries = summary.get('summaries') or {}
+        for record in conversations:
+            convo = record['data']
+            if convo is None:
+                continue
+            new_count = f", {len(convo['messages'])} new" if convo.get('incremental') else ""
+            report.write(f"- {convo['username']}: {convo['message_count']} messages{new_count}\n")
+            if convo['username'] in summaries:
+                report.write(f"  {summaries[convo['username']]}\n")
+        usage = summary.get('summary_usage')
+        if usage:
+            report.write(f"\nSummaries: {usage['cached']} cached, {usage['summarized']} new, "
+                         f"{usage['prompt_tokens'] + usage['completion_tokens']} tokens\n")
+    return report_path
+
+
+if __name__ == "__main__":
+    print(f"Rendered {render_text_report()}")
@@ -0,0 +1,114 @@
+import re
+from collections import Counter
+
+# What each profile aborts. Stylesheets are never blocked since the extractor reads layout.
+# blocked_urls are the same rules as the wildcard patterns Chromium blocks natively; resource_types
+# and url_patterns are for the request-routing fallback on other browsers.
+BLOCK_PROFILES = {
+    "none": {
+        "resource_types": set(),
+        "url_patterns": [],
+        "blocked_urls": [],
+    },
+    # Everything the DM workflow never looks at: pictures, video, fonts and story/reel media
+    "dm-only": {
+        "resource_types": {"image", "media", "font"},
+        "url_patterns": [
+            r"\.(mp4|m4a|webm|jpe?g|png|webp|heic|gif|woff2?|ttf)(\?|$)",
+            r"cdninstagram\.com/.*/(stories|reels?)/",
+            r"/api/v1/feed/reels_media",
+        ],
+        "blocked_urls": [
+            "*.mp4*", "*.m4a*", "*.webm*", "*.jpg*", "*.jpeg*", "*.png*", "*.webp*", "*.heic*", "*.gif*",
+            "*.woff*", "*.ttf*",
+            "*cdninstagram.com/*/stories/*", "*cdninstagram.com/*/reel*",
+            "*/api/v1/feed/reels_media*",
+        ],
+    },
+}
+
+# Blocked requests never report a size, so bytes saved are estimated per resource type
+ESTIMATED_BYTES = {
+    "image": 60_000,
+    "media": 1_500_000,
+    "font": 40_000,
+}
+DEFAULT_ESTIMATED_BYTES = 20_000
+
+
+class RequestBlocker:
+    """Blocks requests by URL pattern (and resource type) and keeps count of what it saved.
+
+    On Chromium each page gets Network.setBlockedURLs over CDP, so nothing else is intercepted.
+    Routing every request through Python instead turns off the browser's HTTP cache, which makes
+    each navigation download Instagram's script and style bundles again; that is only the fallback.
+    """
+
+    def __init__(self, profile="dm-only"):
+        if profile not in BLOCK_PROFILES:
+            raise ValueError(f"Unknown request blocking profile '{profile}', choose from {', '.join(BLOCK_PROFILES)}")
+        self.profile = profile
+        self.resource_types = BLOCK_PROFILES[profile]["resource_types"]
+        self.url_patterns = [re.compile(pattern) for pattern in BLOCK_PROFILES[profile]["url_patterns"]]
+        self.blocked_urls = BLOCK_PROFILES[profile]["blocked_urls"]
+        self.blocked = Counter()
+        self.bytes_saved = 0
+        self.context = None
+        self.use_cdp = False
+
+    def should_block(self, resource_type, url):
+        """Whether a request matches this profile"""
+        if resource_type in self.resource_types:
+            return True
+        return any(pattern.search(url) for pattern in self.url_patterns)
+
+    async def install(self, context):
+        """Set up blocking for the context; each page then needs attach()"""
+        if self.profile == "none":
+            return
+        self.context = context
+        browser = context.browser
+        self.use_cdp = browser is not None and browser.browser_type.name == "chromium"
+        if not self.use_cdp:
+            await context.route("**/*", self._handle_route)
+        print(f"✅ Request blocking enabled with profile '{self.profile}' "
+              f"({'native URL blocking' if self.use_cdp else 'request routing, HTTP cache off'})")
+
+    async def attach(self, page):
+        """Start blocking on a page, before it navigates anywhere"""
+        if not self.use_cdp:
+            return
+        session = await self.context.new_cdp_session(page)
+        session.on("Network.loadingFailed", self._on_loading_failed)
+        await session.send("Network.enable")
+        await session.send("Network.setBlockedURLs", {"urls": self.blocked_urls})
+
+    def _on_loading_failed(self, params):
+        if not params.get("blockedReason"):
+            return
+        # CDP names resource types like "Image"; Playwright's are lower case
+        resource_type = (params.get("type") or "other").lower()
+        self.blocked[resource_type] += 1
+        self.bytes_saved += ESTIMATED_BYTES.get(resource_type, DEFAULT_ESTIMATED_BYTES)
+
+    async def _handle_route(self, route):
+        request = route.request
+        try:
+            if self.should_block(request.resource_type, request.url):
+                self.blocked[request.resource_type] += 1
+                self.bytes_saved += ESTIMATED_BYTES.get(request.resource_type, DEFAULT_ESTIMATED_BYTES)
+                await route.abort()
+            else:
+                await route.continue_()
+        except Exception:
+            # The page may have closed while the request was in flight
+            pass
+
+    def summary(self):
+        """One-line description of what was blocked this run"""
+        total = sum(self.blocked.values())
+        if not total:
+            return f"No requests blocked (profile '{self.profile}')"
+        by_type = ", ".join(f"{kind}: {count}" for kind, count in self.blocked.most_common())
+        return (f"Blocked {total} requests ({by_type}), "
+                f"roughly {self.bytes_saved / 1_000_000:.1f} MB saved (profile '{self.profile}')")
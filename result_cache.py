@@ -0,0 +1,83 @@
+import os
+import time
+from collections import OrderedDict
+
+# How long a cached messages result stays fresh (seconds), and how many results to keep
+MESSAGES_CACHE_TTL = float(os.environ.get("INSTAGRAM_MESSAGES_CACHE_TTL", "120"))
+MESSAGES_CACHE_SIZE = int(os.environ.get("INSTAGRAM_MESSAGES_CACHE_SIZE", "32"))
+
+# Touched by the monitor when it sees new messages; entries cached before its mtime are stale.
+# A file rather than an in-memory flag because the monitor usually runs in another process.
+INVALIDATION_FILE = os.environ.get("INSTAGRAM_CACHE_INVALIDATION_FILE", "messages_cache.invalidate")
+
+
+class TTLCache:
+    """Least-recently-used cache whose entries also expire after ttl seconds"""
+
+    def __init__(self, ttl=MESSAGES_CACHE_TTL, maxsize=MESSAGES_CACHE_SIZE, invalidation_file=INVALIDATION_FILE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.invalidation_file = invalidation_file
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _invalidated_at(self):
+        try:
+            return os.stat(self.invalidation_file).st_mtime
+        except OSError:
+            return 0
+
+    def get(self, key):
+        """The cached value for key, or None if it's missing, expired or invalidated"""
+        entry = self.entries.get(key)
+        if entry is not None:
+            stored_at, value = entry
+            if time.time() - stored_at < self.ttl and stored_at > self._invalidated_at():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self.entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self.entries[key] = (time.time(), value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, account=None):
+        """Drop every entry, or only those whose key starts with account"""
+        if account is None:
+            self.entries.clear()
+            return
+        for key in [key for key in self.entries if key[0] == account]:
+            del self.entries[key]
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "size": len(self.entries),
+        }
+
+
+def invalidate_messages_cache(path=INVALIDATION_FILE):
+    """Mark every cached messages result stale, including ones held by other processes"""
+    try:
+        with open(path, "a"):
+            pass
+        os.utime(path, None)
+    except Exception as e:
+        print(f"Could not invalidate messages cache: {e}")
+
+
+# Results of the instagram_messages tool, keyed by (account, arguments)
+messages_cache = TTLCache()
@@ -0,0 +1,133 @@
+import asyncio
+import os
+import random
+import time
+
+# Hard upper bound on one poll (seconds), so scheduled runs can't pile up
+RUN_DEADLINE = float(os.environ.get("INSTAGRAM_RUN_DEADLINE", "240"))
+
+# Stages in run order with their share of the deadline. Each stage gets its share of whatever
+# time is left, so time a stage doesn't use (or a stage that is skipped) flows to later ones.
+# "report" is never run through the budget; its share just keeps time back for writing results.
+STAGE_SHARES = [
+    ("inbox_check", 0.10),
+    ("login", 0.30),
+    ("navigate", 0.10),
+    ("inbox", 0.10),
+    ("conversations", 0.30),
+    ("report", 0.10),
+]
+
+# Retries per stage after the first attempt, and the first backoff delay (seconds)
+STAGE_RETRIES = 2
+RETRY_BASE_DELAY = 1.0
+
+# Longest a single conversation may take, and how many it may retry
+CONVERSATION_TIMEOUT = float(os.environ.get("INSTAGRAM_CONVERSATION_TIMEOUT", "45"))
+CONVERSATION_RETRIES = 1
+
+# Consecutive failed conversations before we decide Instagram is degraded and stop opening threads
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("INSTAGRAM_CIRCUIT_THRESHOLD", "3"))
+
+
+class DeadlineExceeded(Exception):
+    """A stage or the whole run ran out of time"""
+
+
+class PermanentFailure(Exception):
+    """A stage failure that must not be retried, e.g. a submitted login form"""
+
+
+def backoff_delay(attempt, base=RETRY_BASE_DELAY):
+    """Exponential backoff with jitter for the given retry attempt (1-based)"""
+    return base * (2 ** (attempt - 1)) * random.uniform(0.8, 1.2)
+
+
+class RunBudget:
+    """One poll's deadline, split into per-stage budgets, with bounded retries inside each stage"""
+
+    def __init__(self, deadline=RUN_DEADLINE, shares=STAGE_SHARES):
+        self.total = deadline
+        self.shares = shares
+        self.started = time.monotonic()
+        self.ends = self.started + deadline
+        self.stages = []
+
+    def remaining(self):
+        return max(0.0, self.ends - time.monotonic())
+
+    def stage_budget(self, stage):
+        """Seconds this stage may use: its share of the time left, weighed against the stages after it"""
+        names = [name for name, _ in self.shares]
+        if stage not in names:
+            return self.remaining()
+        later = self.shares[names.index(stage):]
+        return self.remaining() * later[0][1] / sum(share for _, share in later)
+
+    def record(self, stage, budget, start, attempts, ok, error=None):
+        self.stages.append({
+            "stage": stage,
+            "budget_s": round(budget, 1),
+            "elapsed_s": round(time.monotonic() - start, 2),
+            "attempts": attempts,
+            "ok": ok,
+            "error": error,
+        })
+
+    async def run_stage(self, stage, coroutine_fn, retries=STAGE_RETRIES):
+        """Run coroutine_fn() within the stage's budget, retrying failures with exponential backoff"""
+        budget = self.stage_budget(stage)
+        start = time.monotonic()
+        stage_ends = start + budget
+        attempt = 0
+        while True:
+            attempt += 1
+            remaining = stage_ends - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                result = await asyncio.wait_for(coroutine_fn(), timeout=remaining)
+                self.record(stage, budget, start, attempt, True)
+                return result
+            except asyncio.TimeoutError:
+                self.record(stage, budget, start, attempt, False, "deadline")
+                raise DeadlineExceeded(f"{stage} ran out of its {budget:.0f}s budget")
+            except PermanentFailure as e:
+                self.record(stage, budget, start, attempt, False, str(e))
+                raise
+            except Exception as e:
+                delay = backoff_delay(attempt)
+                if attempt > retries or time.monotonic() + delay >= stage_ends:
+                    self.record(stage, budget, start, attempt, False, str(e))
+                    raise
+                print(f"🔁 {stage} failed ({e}), retrying in {delay:.1f}s ({attempt}/{retries})")
+                await asyncio.sleep(delay)
+
+    def summary(self):
+        """One-line description of how the run spent its deadline"""
+        if not self.stages:
+            return f"Run budget: {self.total:.0f}s, no stages run"
+        parts = [
+            f"{s['stage']} {s['elapsed_s']:.1f}/{s['budget_s']:.0f}s" + ("" if s['ok'] else f" ({s['error']})")
+            for s in self.stages
+        ]
+        used = time.monotonic() - self.started
+        return f"Run budget: {used:.1f}/{self.total:.0f}s used - " + ", ".join(parts)
+
+
+class CircuitBreaker:
+    """Stops opening threads after enough consecutive failures that Instagram is clearly degraded"""
+
+    def __init__(self, threshold=CIRCUIT_FAILURE_THRESHOLD):
+        self.threshold = threshold
+        self.consecutive_failures = 0
+        self.open = False
+
+    def record(self, ok):
+        if ok:
+            self.consecutive_failures = 0
+            return
+        self.consecutive_failures += 1
+        if not self.open and self.consecutive_failures >= self.threshold:
+            self.open = True
+            print(f"⛔ {self.consecutive_failures} conversations failed in a row, skipping the rest of this run")
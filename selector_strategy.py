@@ -0,0 +1,73 @@
+import asyncio
+
+from json_store import JsonFileStore
+
+# Per-stage hit/miss counts for every selector we've tried
+SELECTOR_STATS_FILE = "selector_stats.json"
+
+# Timeout (ms) for trying the best-known selector on its own before racing the rest
+FAST_PATH_TIMEOUT = 1500
+
+
+class SelectorStrategy(JsonFileStore):
+    """Races a stage's fallback selectors at once and remembers which one usually wins"""
+
+    description = "selector stats"
+
+    def __init__(self, path=SELECTOR_STATS_FILE):
+        super().__init__(path)
+        self.stats = self.data
+
+    def loaded(self):
+        self.stats = self.data
+
+    def best(self, stage, candidates):
+        """The candidate with the best track record for this stage, or None if none has won yet"""
+        stage_stats = self.stats.get(stage, {})
+        scored = [
+            (stage_stats[selector]["hits"] - stage_stats[selector]["misses"], selector)
+            for selector in candidates if selector in stage_stats
+        ]
+        scored = [item for item in scored if item[0] > 0]
+        if not scored:
+            return None
+        return max(scored)[1]
+
+    def _record(self, stage, selector, hit):
+        entry = self.stats.setdefault(stage, {}).setdefault(selector, {"hits": 0, "misses": 0})
+        entry["hits" if hit else "misses"] += 1
+        self.changed = True
+
+    async def find(self, page, stage, candidates, timeout=5000, fast_timeout=FAST_PATH_TIMEOUT):
+        """Return (element, selector) for the first candidate to appear, or (None, None).
+
+        The best-known selector gets a short solo attempt first; if it misses, every
+        candidate is raced at once so a markup change costs one timeout, not the sum of all.
+        """
+        best = self.best(stage, candidates)
+        if best:
+            try:
+                element = await page.wait_for_selector(best, timeout=fast_timeout)
+                if element:
+                    self._record(stage, best, True)
+                    return element, best
+            except Exception:
+                pass
+            self._record(stage, best, False)
+            print(f"Best-known selector for '{stage}' missed, racing all candidates...")
+
+        tasks = {asyncio.ensure_future(page.wait_for_selector(selector, timeout=timeout)): selector for selector in candidates}
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and task.result() is not None:
+                        selector = tasks[task]
+                        self._record(stage, selector, True)
+                        return task.result(), selector
+            return None, None
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -24,8 +24,16 @@ from portia import (
 from portia.open_source_tools.local_file_reader_tool import FileReaderTool
 # from portia.open_source_tools.local_file_writer_tool import FileWriterTool
 from portia.open_source_tools.search_tool import SearchTool
+from plan_cache import PlanCache
 load_dotenv()
 
+# The same request every run; only the values change, so its plan is cached and replayed
+# The file reader only accepts plain-text/table/JSON suffixes, so this is the rendered report, not the .jsonl records
+EMAIL_PROMPT_TEMPLATE = (
+    "Read the contents of the file downintheDM/instagram_dm_multi_report.txt, which holds each conversation "
+    "followed by a run summary, and send the conversations and summary via email ({email}) nicely formatted"
+)
+
 
 my_config = Config.from_default(
      storage_class=StorageClass.DISK,
@@ -40,9 +48,11 @@ my_tool_registry = InMemoryToolRegistry.from_local_tools([FileReaderTool()])
 
 
 
+tools = my_tool_registry + PortiaToolRegistry(config=default_config())
+
 portia = Portia(
     config=my_config,
-    tools=my_tool_registry + PortiaToolRegistry(config=default_config()),
+    tools=tools,
     execution_hooks=CLIExecutionHooks(),
 )
 
@@ -52,9 +62,8 @@ name = input ("Input your name: ")
 data = {"email_address": email,"name":name}
 # We can also provide additional execution context to the process
 with execution_context(end_user_id='end_user', additional_data=data):
-    plan_run = portia.run(
-        f"Read the contents of the file downintheDM/instagram_dm_text_report.txt send file contents via email ({email}) nicely formatted",
-    )
+    plan = PlanCache.load(my_config.storage_dir).plan_for(portia, EMAIL_PROMPT_TEMPLATE, {"email": email}, tools)
+    plan_run = portia.run_plan(plan)
 # plan = portia.plan('Which stock price grew faster in 2024, Amazon or Google?')
 
 print(plan_run.model_dump_json(indent=2))
@@ -0,0 +1,81 @@
+import json
+import os
+import time
+
+# Directory holding one Playwright storage state file per Instagram account
+SESSION_DIR = os.environ.get("INSTAGRAM_SESSION_DIR", "sessions")
+
+# Selectors that only show up once we're logged in
+LOGGED_IN_SELECTOR = 'svg[aria-label="Home"], a[href="/direct/inbox/"]'
+LOGIN_FORM_SELECTOR = 'input[name="username"]'
+
+
+def session_path(account):
+    """Return the storage state file path for an account"""
+    safe_name = "".join(c if c.isalnum() or c in "._-" else "_" for c in account)
+    return os.path.join(SESSION_DIR, f"{safe_name}.json")
+
+
+def load_session(account):
+    """Return the saved storage state path for an account, or None if there isn't a usable one"""
+    if not account:
+        return None
+
+    path = session_path(account)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, "r") as f:
+            state = json.load(f)
+    except Exception as e:
+        print(f"Could not read saved session {path}: {e}")
+        return None
+
+    # Without Instagram's session cookie there is nothing worth restoring
+    now = time.time()
+    for cookie in state.get("cookies", []):
+        if cookie.get("name") == "sessionid":
+            expires = cookie.get("expires", -1)
+            if expires == -1 or expires > now:
+                return path
+            print("Saved session cookie has expired")
+            return None
+
+    return None
+
+
+async def save_session(context, account):
+    """Save the context's cookies and localStorage for the next run"""
+    if not account:
+        return None
+
+    os.makedirs(SESSION_DIR, exist_ok=True)
+    path = session_path(account)
+    await context.storage_state(path=path)
+    # The file holds live session cookies, keep it private
+    os.chmod(path, 0o600)
+    print(f"✅ Saved session for {account} to {path}")
+    return path
+
+
+def clear_session(account):
+    """Remove a stale session file so the next run does a full login"""
+    path = session_path(account)
+    if os.path.exists(path):
+        os.remove(path)
+        print(f"Removed stale session file {path}")
+
+
+async def is_session_valid(page, home_url, timeout=5000):
+    """Open the home page with the restored session and check we're not sent back to the login form"""
+    try:
+        await page.goto(home_url, timeout=15000)
+        await page.wait_for_selector(f"{LOGGED_IN_SELECTOR}, {LOGIN_FORM_SELECTOR}", timeout=timeout)
+    except Exception as e:
+        print(f"Could not confirm saved session: {e}")
+        return False
+
+    if "/accounts/login" in page.url:
+        return False
+    return await page.query_selector(LOGIN_FORM_SELECTOR) is None
@@ -0,0 +1,99 @@
+import asyncio
+import atexit
+import threading
+
+from main import InstagramSession, INSTAGRAM_USERNAME
+
+# Longest a single tool call may wait on the browser (seconds)
+OPERATION_TIMEOUT = 600
+
+
+class SharedInstagramSession:
+    """One long-lived InstagramSession owned by a dedicated event loop thread, callable from synchronous code.
+
+    Agent tools run synchronously and may be called from any thread, while Playwright objects
+    belong to the loop that created them. Every operation is therefore submitted to the same
+    background loop, one at a time, and the browser stays open (and logged in) between calls.
+    """
+
+    def __init__(self):
+        self.loop = None
+        self.thread = None
+        self.session = None
+        self.lock = threading.Lock()
+
+    def _ensure_loop(self):
+        if self.loop is not None:
+            return
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="instagram-session", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def _call(self, coroutine_fn, timeout=OPERATION_TIMEOUT):
+        """Run coroutine_fn() on the session's loop and wait for its result"""
+        with self.lock:
+            self._ensure_loop()
+            future = asyncio.run_coroutine_threadsafe(coroutine_fn(), self.loop)
+            return future.result(timeout)
+
+    async def _session_for(self, username=None, password=None):
+        # A different account needs its own browser context and saved session
+        if self.session and username and username != self.session.username:
+            await self.session.close()
+            self.session = None
+        if self.session is None:
+            session = InstagramSession(username=username, password=password)
+            await session.start()
+            self.session = session
+        elif password:
+            self.session.password = password
+        return self.session
+
+    def account(self):
+        """The account the session is (or will be) logged in as"""
+        return self.session.username if self.session else INSTAGRAM_USERNAME
+
+    def login(self, username=None, password=None):
+        """Log in (or confirm the saved session) without reading any messages"""
+        async def login():
+            session = await self._session_for(username, password)
+            if not session.logged_in:
+                # Each login call may submit the form once, like each poll
+                session.form_login_attempted = False
+                await session.login()
+            return session
+
+        return self._call(login)
+
+    def messages(self):
+        """Poll the inbox on the warm session, returning the poll result plus the inbox threads it read"""
+        async def messages():
+            session = await self._session_for()
+            result = await session.poll()
+            return result, list(session.inbox_threads), session.on_dm_page
+
+        return self._call(messages)
+
+    def close(self):
+        """Close the browser and stop the loop thread"""
+        if self.loop is None:
+            return
+
+        async def close():
+            if self.session:
+                await self.session.close()
+                self.session = None
+
+        try:
+            self._call(close, timeout=60)
+        except Exception as e:
+            print(f"Error closing shared Instagram session: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=10)
+        self.loop = None
+        self.thread = None
+
+
+# The session every Instagram tool in this process shares
+shared_session = SharedInstagramSession()
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+import urllib.request
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from json_store import JsonFileStore
+
+# OpenAI-compatible chat completions endpoint; point the base URL at a local stub for testing
+SUMMARY_BASE_URL = os.environ.get("INSTAGRAM_SUMMARY_BASE_URL", "https://api.openai.com/v1")
+SUMMARY_MODEL = os.environ.get("INSTAGRAM_SUMMARY_MODEL", "gpt-3.5-turbo")
+SUMMARY_API_KEY = os.environ.get("OPENAI_API_KEY", "")
+
+# Most prompt tokens to pack into one request, and what we leave for the answer
+SUMMARY_TOKEN_BUDGET = int(os.environ.get("INSTAGRAM_SUMMARY_TOKEN_BUDGET", "3000"))
+SUMMARY_MAX_OUTPUT_TOKENS = int(os.environ.get("INSTAGRAM_SUMMARY_MAX_OUTPUT_TOKENS", "600"))
+
+# Summaries by conversation content hash, and one usage line per run
+SUMMARY_CACHE_FILE = "summary_cache.json"
+SUMMARY_USAGE_FILE = "summary_usage.jsonl"
+
+# Summaries kept in the cache; the least recently used go first
+MAX_CACHED_SUMMARIES = int(os.environ.get("INSTAGRAM_SUMMARY_CACHE_SIZE", "500"))
+
+# Longest one completion request may take (seconds), and the least time worth starting one with
+SUMMARY_REQUEST_TIMEOUT = 60
+MIN_REQUEST_TIME = 5
+
+SYSTEM_PROMPT = (
+    "You summarize Instagram direct message conversations for their owner. "
+    "For each conversation you are given, write one or two sentences covering what was said and anything "
+    "that needs a reply. Answer with a JSON object mapping each conversation's key to its summary, nothing else."
+)
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English chat text)"""
+    return len(text) // 4 + 1
+
+
+def conversation_lines(convo):
+    """The conversation's message window as normalized 'sender: text' lines"""
+    lines = []
+    for msg in convo.get('messages', []):
+        sender = "You" if msg.get('is_mine') else convo['username']
+        text = re.sub(r"\s+", " ", msg.get('text') or "").strip()
+        if text:
+            lines.append(f"{sender}: {text}")
+    return lines
+
+
+def conversation_hash(convo):
+    """Hash of who the conversation is with and its normalized messages; unchanged threads hash the same"""
+    key = "\n".join([convo['username']] + conversation_lines(convo))
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def conversation_block(key, convo, max_tokens):
+    """Prompt section for one conversation, dropping its oldest lines if it wouldn't fit on its own"""
+    header = f"### {key} (conversation with {convo['username']})"
+    lines = conversation_lines(convo)
+    while lines and estimate_tokens("\n".join([header] + lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join([header] + lines)
+
+
+def pack_batches(blocks, budget):
+    """Group (key, block) pairs into as few prompts as fit within budget tokens each"""
+    batches, current, used = [], [], estimate_tokens(SYSTEM_PROMPT)
+    for key, block in blocks:
+        cost = estimate_tokens(block)
+        if current and used + cost > budget:
+            batches.append(current)
+            current, used = [], estimate_tokens(SYSTEM_PROMPT)
+        current.append((key, block))
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def parse_summaries(content):
+    """Pull the JSON object out of the model's answer, tolerating code fences around it"""
+    match = re.search(r"\{.*\}", content, re.DOTALL)
+    if not match:
+        raise ValueError("No JSON object in summary response")
+    return json.loads(match.group(0))
+
+
+class SummaryCache(JsonFileStore):
+    """Summaries by conversation content hash, capped to the most recently used entries"""
+
+    description = "summary cache"
+
+    def __init__(self, path=SUMMARY_CACHE_FILE, max_entries=MAX_CACHED_SUMMARIES):
+        super().__init__(path)
+        self.max_entries = max_entries
+
+    def get(self, content_hash):
+        entry = self.data.get(content_hash)
+        if entry:
+            entry["used"] = time.time()
+            self.changed = True
+        return entry
+
+    def put(self, content_hash, username, summary, created):
+        self.data[content_hash] = {"username": username, "summary": summary, "created": created, "used": time.time()}
+        self.changed = True
+
+    def save(self):
+        if len(self.data) > self.max_entries:
+            recent = sorted(self.data.items(), key=lambda item: item[1].get("used", 0), reverse=True)
+            self.data = dict(recent[:self.max_entries])
+            self.changed = True
+        super().save()
+
+
+class ThreadSummarizer:
+    """Summarizes only conversations whose content changed, batching them into as few LLM calls as fit"""
+
+    def __init__(self, base_url=SUMMARY_BASE_URL, model=SUMMARY_MODEL, api_key=SUMMARY_API_KEY,
+                 token_budget=SUMMARY_TOKEN_BUDGET, cache_path=SUMMARY_CACHE_FILE, usage_path=SUMMARY_USAGE_FILE):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.api_key = api_key
+        self.token_budget = token_budget
+        self.usage_path = usage_path
+        self.cache = SummaryCache.load(cache_path)
+
+    def _complete(self, prompt, timeout=SUMMARY_REQUEST_TIMEOUT):
+        """One chat completion; returns (content, usage dict)"""
+        body = json.dumps({
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ],
+            "max_tokens": SUMMARY_MAX_OUTPUT_TOKENS,
+            "temperature": 0,
+        }).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        request = urllib.request.Request(f"{self.base_url}/chat/completions", data=body, headers=headers)
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            payload = json.loads(response.read().decode("utf-8"))
+        return payload["choices"][0]["message"]["content"], payload.get("usage") or {}
+
+    def summarize(self, conversations, timeout=None):
+        """Summaries keyed by username plus this run's usage: cache hits cost nothing, the rest are batched.
+
+        With timeout (seconds), no request outlives it and batches it leaves no time for are skipped.
+        """
+        summaries = {}
+        pending = []
+        for convo in conversations:
+            if not conversation_lines(convo):
+                continue
+            content_hash = conversation_hash(convo)
+            cached = self.cache.get(content_hash)
+            if cached:
+                summaries[convo['username']] = cached['summary']
+            else:
+                pending.append((content_hash, convo))
+
+        usage = {
+            "run_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "model": self.model,
+            "conversations": len(summaries) + len(pending),
+            "cached": len(summaries),
+            "summarized": 0,
+            "requests": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "errors": 0,
+            "skipped": 0,
+            "elapsed_ms": 0,
+        }
+        start = time.monotonic()
+        ends = start + timeout if timeout is not None else None
+
+        # Keys are short and stable within a run so the model can't confuse similar usernames
+        by_key = {f"c{i+1}": item for i, item in enumerate(pending)}
+        per_block_budget = self.token_budget - estimate_tokens(SYSTEM_PROMPT)
+        blocks = [(key, conversation_block(key, convo, per_block_budget)) for key, (_, convo) in by_key.items()]
+        for batch in pack_batches(blocks, self.token_budget):
+            request_timeout = SUMMARY_REQUEST_TIMEOUT
+            if ends is not None:
+                request_timeout = min(request_timeout, ends - time.monotonic())
+                if request_timeout < MIN_REQUEST_TIME:
+                    usage["skipped"] += len(batch)
+                    continue
+            prompt = "\n\n".join(block for _, block in batch)
+            usage["requests"] += 1
+            try:
+                content, call_usage = self._complete(prompt, request_timeout)
+                batch_summaries = parse_summaries(content)
+            except Exception as e:
+                print(f"Error summarizing {len(batch)} conversations: {e}")
+                usage["errors"] += 1
+                usage["prompt_tokens"] += estimate_tokens(prompt)
+                continue
+            usage["prompt_tokens"] += call_usage.get("prompt_tokens", estimate_tokens(prompt))
+            usage["completion_tokens"] += call_usage.get("completion_tokens", estimate_tokens(content))
+            for key, _ in batch:
+                summary = batch_summaries.get(key)
+                if not summary:
+                    continue
+                content_hash, convo = by_key[key]
+                summaries[convo['username']] = summary
+                self.cache.put(content_hash, convo['username'], summary, usage["run_at"])
+                usage["summarized"] += 1
+
+        usage["elapsed_ms"] = round((time.monotonic() - start) * 1000)
+        self._save(usage)
+        print(f"🧠 Summaries: {usage['cached']} cached, {usage['summarized']} new in {usage['requests']} request(s), "
+              f"{usage['prompt_tokens']}+{usage['completion_tokens']} tokens"
+              + (f", {usage['skipped']} skipped for time" if usage['skipped'] else ""))
+        return summaries, usage
+
+    def _save(self, usage):
+        self.cache.save()
+        try:
+            with open(self.usage_path, "a") as f:
+                f.write(json.dumps(usage) + "\n")
+        except Exception as e:
+            print(f"Error saving summary usage: {e}")
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """Minimal OpenAI-compatible chat completions endpoint that echoes a canned summary per conversation"""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        prompt = body["messages"][-1]["content"]
+        keys = re.findall(r"^### (\S+) \(conversation with (.+?)\)$", prompt, re.MULTILINE)
+        content = json.dumps({key: f"Stub summary of the conversation with {username}." for key, username in keys})
+        payload = json.dumps({
+            "choices": [{"message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": estimate_tokens(prompt), "completion_tokens": estimate_tokens(content)},
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        print(f"stub llm: {format % args}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stub LLM endpoint for testing summarization")
+    parser.add_argument("--port", type=int, default=8808)
+    args = parser.parse_args()
+    print(f"Stub LLM listening on http://127.0.0.1:{args.port}/v1 "
+          f"(set INSTAGRAM_SUMMARY_BASE_URL to use it)")
+    HTTPServer(("127.0.0.1", args.port), StubLLMHandler).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
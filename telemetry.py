@@ -0,0 +1,183 @@
+import contextvars
+import json
+import os
+import time
+from contextlib import contextmanager
+
+# Where each run's spans are written, and the Prometheus textfile a node exporter can scrape
+RUN_METRICS_FILE = os.environ.get("INSTAGRAM_METRICS_FILE", "instagram_run_metrics.json")
+PROMETHEUS_FILE = os.environ.get("INSTAGRAM_PROMETHEUS_FILE", "instagram_dm.prom")
+
+METRIC_PREFIX = "instagram_dm"
+
+# Innermost open span in the current task, so concurrent conversations nest correctly
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed operation with free-form attributes"""
+
+    def __init__(self, tracer, name, parent=None, **attributes):
+        self.tracer = tracer
+        self.name = name
+        self.parent = parent
+        self.attributes = dict(attributes)
+        self.start = time.time()
+        self._start_monotonic = time.monotonic()
+        self.duration = None
+        self.status = "ok"
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def fail(self, error):
+        """Mark the span failed without raising, for operations that report errors as values"""
+        self.status = "error"
+        self.error = error
+
+    def finish(self, error=None):
+        """Close the span; safe to call more than once"""
+        if self.duration is not None:
+            return
+        self.duration = time.monotonic() - self._start_monotonic
+        if error is not None:
+            self.status = "error"
+            self.error = str(error) or type(error).__name__
+        self.tracer.spans.append(self)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "parent": self.parent,
+            "start": round(self.start, 3),
+            "duration_s": round(self.duration, 4) if self.duration is not None else None,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class Tracer:
+    """Collects one run's spans and exports them as JSON and Prometheus text format"""
+
+    def __init__(self, account=None):
+        self.account = account
+        self.started = time.time()
+        self.spans = []
+        # Run-level counters and gauges, keyed by (metric name, frozen labels)
+        self.metrics = {}
+
+    def start_span(self, name, **attributes):
+        """Open a span explicitly; the caller must finish() it"""
+        parent = _current_span.get()
+        return Span(self, name, parent.name if parent else None, **attributes)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Time the enclosed block, recording an error status if it raises"""
+        span = self.start_span(name, **attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.finish(error=e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.finish()
+
+    def annotate(self, **attributes):
+        """Add attributes to the innermost open span, if any"""
+        span = _current_span.get()
+        if span is not None:
+            span.set(**attributes)
+
+    def gauge(self, name, value, **labels):
+        self.metrics[(name, tuple(sorted(labels.items())))] = value
+
+    def to_dict(self):
+        return {
+            "account": self.account,
+            "started": round(self.started, 3),
+            "duration_s": round(time.time() - self.started, 3),
+            "spans": [span.to_dict() for span in self.spans],
+            "metrics": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in self.metrics.items()
+            ],
+        }
+
+    def export_json(self, path=RUN_METRICS_FILE):
+        _atomic_write(path, json.dumps(self.to_dict(), indent=2))
+        return path
+
+    def prometheus_text(self):
+        """Last run's numbers in Prometheus text exposition format"""
+        account = self.account or "default"
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{_escape(str(val))}"' for key, val in [("account", account)] + labels)
+                lines.append(f"{METRIC_PREFIX}_{name}{{{label_text}}} {value}")
+
+        metric("run_timestamp_seconds", "gauge", "When the last run started.", [([], round(self.started, 3))])
+        metric("run_duration_seconds", "gauge", "How long the last run took.",
+               [([], round(time.time() - self.started, 3))])
+
+        # A stage can run more than once per run (e.g. retried polls), so each series is a total
+        stages = {}
+        for span in self.spans:
+            if span.name == "conversation":
+                continue
+            stage = stages.setdefault(span.name, {"duration": 0.0, "errors": 0, "attempts": 0})
+            stage["duration"] += span.duration
+            stage["errors"] += span.status == "error"
+            stage["attempts"] += span.attributes.get("attempts", 1)
+        metric("stage_duration_seconds", "gauge", "Time spent in each stage in the last run.",
+               [([("stage", name)], round(stage["duration"], 4)) for name, stage in stages.items()])
+        metric("stage_errors", "gauge", "Failed spans of each stage in the last run.",
+               [([("stage", name)], stage["errors"]) for name, stage in stages.items()])
+        metric("stage_attempts", "gauge", "Attempts each stage needed in the last run.",
+               [([("stage", name)], stage["attempts"]) for name, stage in stages.items()])
+
+        # Per-conversation numbers are aggregated; usernames would make the label set unbounded
+        conversations = [span for span in self.spans if span.name == "conversation"]
+        for status in ("ok", "error"):
+            matching = [span for span in conversations if span.status == status]
+            metric(f"conversations_{status}", "gauge", f"Conversations that ended with status {status} in the last run.",
+                   [([], len(matching))])
+        durations = [span.duration for span in conversations]
+        metric("conversation_duration_seconds_sum", "gauge", "Total time spent on conversations in the last run.",
+               [([], round(sum(durations), 4))])
+        metric("conversation_duration_seconds_max", "gauge", "Slowest conversation in the last run.",
+               [([], round(max(durations), 4) if durations else 0)])
+        metric("conversation_retries", "gauge", "Conversation retries in the last run.",
+               [([], sum(span.attributes.get("retries", 0) for span in conversations))])
+
+        by_name = {}
+        for (name, labels), value in self.metrics.items():
+            by_name.setdefault(name, []).append((list(labels), value))
+        for name, samples in sorted(by_name.items()):
+            metric(name, "gauge", f"{name.replace('_', ' ').capitalize()} in the last run.", samples)
+
+        return "\n".join(line for line in lines if line) + "\n"
+
+    def export_prometheus(self, path=PROMETHEUS_FILE):
+        # Written atomically, the node exporter's textfile collector must never see a partial file
+        _atomic_write(path, self.prometheus_text())
+        return path
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _atomic_write(path, content):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(temp_path, path)
@@ -0,0 +1,34 @@
+from message_parser import parse_message_rows
+
+
+def texts(rows, username="divit", account="me"):
+    messages, _ = parse_message_rows(rows, username, account)
+    return [message["text"] for message in messages]
+
+
+def test_sender_echo_is_dropped_above_message_text():
+    assert texts([{"text": "divit\nsee you at 8\nEnter"}]) == ["see you at 8"]
+
+
+def test_one_line_message_starting_with_a_name_is_kept():
+    assert texts([{"text": "divit is late again"}]) == ["divit is late again"]
+    assert texts([{"text": "divit is late again\nEnter"}]) == ["divit is late again"]
+    assert texts([{"text": "me too"}]) == ["me too"]
+
+
+def test_message_that_is_just_a_time_is_kept():
+    rows = [
+        {"text": "10:30", "bubble": None},
+        {"text": "what time?", "bubble": "what time?"},
+        {"text": "10:30", "bubble": "10:30"},
+    ]
+    messages, stats = parse_message_rows(rows, "divit")
+    assert [message["text"] for message in messages] == ["what time?", "10:30"]
+    assert stats["separators"] == 1
+
+
+def test_separator_row_without_bubble_sets_timestamp():
+    messages, _ = parse_message_rows(
+        [{"text": "Yesterday at 23:29", "bubble": ""}, {"text": "hi", "bubble": "hi"}], "divit"
+    )
+    assert messages[0]["timestamp"].endswith("23:29:00")
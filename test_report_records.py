@@ -0,0 +1,58 @@
+from report_records import ReportWriter, load_report, unfinished_run
+
+
+def collected(username, text, preview):
+    return {
+        "username": username,
+        "data": {"username": username, "messages": [{"text": text}], "message_count": 1},
+        "error": None,
+        "error_details": None,
+        "preview": preview,
+    }
+
+
+def crashed_run(path):
+    """Run 1: alice is collected at preview m1, then the run dies before bob finishes"""
+    writer = ReportWriter("me", path)
+    writer.write_conversation(0, collected("alice", "m1", "m1"))
+    writer.write_conversation(1, {"username": "bob", "data": None, "error": "crashed", "error_details": None})
+    writer.close()
+
+
+def test_finished_run_is_not_resumed(tmp_path):
+    path = str(tmp_path / "report.jsonl")
+    writer = ReportWriter("me", path)
+    writer.write_conversation(0, collected("alice", "m1", "m1"))
+    writer.write_summary({"unread_count": 0})
+    assert unfinished_run("me", path) is None
+
+
+def test_unchanged_thread_is_carried_over(tmp_path):
+    path = str(tmp_path / "report.jsonl")
+    crashed_run(path)
+    run, completed = unfinished_run("me", path, previews={"alice": "m1", "bob": "b1"})
+    assert run["account"] == "me"
+    assert [record["username"] for record in completed] == ["alice"]
+    assert completed[0]["preview"] == "m1"
+
+
+def test_thread_that_moved_since_the_crash_is_collected_again(tmp_path):
+    path = str(tmp_path / "report.jsonl")
+    crashed_run(path)
+    # alice got m2 between the crash and the resumed run
+    run, completed = unfinished_run("me", path, previews={"alice": "m2", "bob": "b1"})
+    assert completed == []
+
+    # The resumed journal then holds only what the new run collects
+    writer = ReportWriter("me", path, resume=(run, completed))
+    writer.write_conversation(0, collected("alice", "m2", "m2"))
+    writer.write_summary({"unread_count": 0})
+    _, conversations, summary = load_report(path)
+    assert [(record["username"], record["preview"]) for record in conversations] == [("alice", "m2")]
+    assert summary is not None
+
+
+def test_other_accounts_runs_are_not_resumed(tmp_path):
+    path = str(tmp_path / "report.jsonl")
+    crashed_run(path)
+    assert unfinished_run("someone_else", path) is None